@@ -1,6 +1,5 @@
 from .logging_setup import init_general_logger
-from .monitoring import Timer, ErrorCatcher, get_metrics_start, get_metrics_end
-from .analysis import generate_plots, parse_log_lines, detect_recent_dense_block
+from .monitoring import Timer, ErrorCatcher, flush_results, get_metrics_start, get_metrics_end
 
 try:
     from importlib.metadata import version
@@ -9,13 +8,24 @@ except ImportError:
 
 __version__ = version("pymaap")
 
+_ANALYSIS_EXPORTS = ("generate_plots", "parse_log_lines", "detect_recent_dense_block", "parse_timestamps")
+
+def __getattr__(name):
+    # analysis pulls in pandas, matplotlib and seaborn; only import it when used
+    if name in _ANALYSIS_EXPORTS:
+        from . import analysis
+        return getattr(analysis, name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
 __all__ = [
     "init_general_logger",
     "Timer",
     "ErrorCatcher",
+    "flush_results",
     "get_metrics_start",
     "get_metrics_end",
     "generate_plots",
     "parse_log_lines",
     "detect_recent_dense_block",
+    "parse_timestamps",
 ]
@@ -0,0 +1,30 @@
+# pymaap/_json.py
+
+"""
+JSON encoding and decoding for log records: orjson when it is installed, the
+standard library otherwise. Both produce the same compact text (dumpb() as
+UTF-8 bytes, for binary files); both loads() accept bytes and raise
+ValueError on malformed input.
+"""
+
+import json
+
+try:
+    import orjson
+except ImportError:  # optional dependency: pip install pymaap[fast]
+    orjson = None
+
+if orjson is not None:
+    def dumps(obj):
+        return orjson.dumps(obj).decode()
+
+    dumpb = orjson.dumps
+    loads = orjson.loads
+else:
+    def dumps(obj):
+        return json.dumps(obj, separators=(",", ":"), ensure_ascii=False)
+
+    def dumpb(obj):
+        return dumps(obj).encode()
+
+    loads = json.loads
@@ -0,0 +1,22 @@
+# pymaap/_log_re.py
+
+"""
+The timing log line format, in one place for both sides: get_metrics_start()
+and get_metrics_end() write messages with START_FORMAT and END_FORMAT, and
+the analysis parses them back with PATTERN, compiled once per interpreter.
+"""
+
+import re
+
+START_FORMAT = "%s: start: wall=%.4f perf=%.4f id=%s cpu=%.2f%% rss=%d vms=%d mem%%=%.2f threads=%d fds=%d"
+END_FORMAT = (
+    "%s: end: wall=%.4f perf=%.4f id=%s duration=%.4fsec cpu=%.2f%% rss=%d vms=%d mem%%=%.2f threads=%d fds=%d"
+)
+
+# Messages begin with the function name, so anchor there
+PATTERN = re.compile(
+    r"^(?P<func>[^\s:]+): (?P<type>start|end): wall=(?P<wall>[\d.]+) perf=(?P<perf>[\d.]+) id=(?P<id>[0-9A-Za-z_-]+)"
+    r"(?: duration=(?P<duration>[\d.]+)sec)? cpu=(?P<cpu>[\d.]+)% rss=(?P<rss>\d+) vms=(?P<vms>\d+)"
+    r" mem%=(?P<mem>[\d.]+) threads=(?P<threads>\d+) fds=(?P<fds>\d+)",
+    re.ASCII,  # Every field is ASCII, so \d and \s need no Unicode lookups
+)
@@ -1,45 +1,122 @@
 # pymaap/analysis.py
 
 import argparse
-import json
-import re
+import itertools
+import mmap
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from collections import defaultdict
 from datetime import datetime
 import os
-import glob
+import numpy as np
 import pandas as pd
 import matplotlib.pyplot as plt
 import seaborn as sns
 
+from pymaap import _json
+from pymaap._log_re import PATTERN as _LOG_PATTERN
 from pymaap.logging_setup import init_general_logger
 logger = init_general_logger(__name__)
 
-def load_all_log_lines(logdir: Path):
+_TIMESTAMP_FORMAT = "%Y-%m-%d %H:%M:%S,%f"
+
+_EVENT_DTYPES = {
+    "wall": "float64", "perf": "float64", "duration": "float64", "cpu": "float64",
+    "rss": "int64", "vms": "int64", "mem": "float64", "threads": "int64", "fds": "int64",
+}
+
+_MAX_LOAD_WORKERS = 8
+
+def _read_lines(f):
+    """Yield the non-empty lines of a binary file, scanning a memory map for newlines so only one line is copied at a time."""
+    if os.fstat(f.fileno()).st_size == 0:
+        return  # mmap cannot map an empty file
+    with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        find = mm.find
+        pos = 0
+        while (nl := find(b"\n", pos)) >= 0:
+            if nl > pos:
+                yield mm[pos:nl]
+            pos = nl + 1
+        if pos < len(mm):
+            yield mm[pos:]
+
+
+def find_log_files(logdir: Path):
+    """
+    Lists the timing.log file and its rotated backups, sorted by name.
+
+    Uses one os.scandir pass; the DirEntry objects already know their names
+    and types, so no extra stat() call is made per file.
+
+    Args:
+        logdir (Path): Location of the .log file(s)
+
+    Returns:
+        list[Path]: Paths of the timing.log* files
+    """
+    try:
+        with os.scandir(logdir) as entries:
+            return sorted(Path(entry.path) for entry in entries
+                          if entry.name.startswith("timing.log") and entry.is_file())
+    except FileNotFoundError:
+        return []  # Like Path.glob on a missing directory
+
+
+def load_all_log_lines(logdir: Path, log_files=None):
     """
     Gathers all .log file(s) contents into one object
 
     Args:
         logdir (Path): Location of the .log file(s)
+        log_files (list, optional): find_log_files(logdir), if already computed.
 
     Returns:
         log_lines: Object containing all lines from the .log file(s)
     """
-    log_files = sorted(logdir.glob("timing.log*"))
+    if log_files is None:
+        log_files = find_log_files(logdir)
+    if len(log_files) <= 1:
+        return _load_log_file(log_files[0]) if log_files else []
+    # Rotated files are independent; reads overlap across threads and order is kept
+    with ThreadPoolExecutor(max_workers=min(_MAX_LOAD_WORKERS, len(log_files))) as executor:
+        return list(itertools.chain.from_iterable(executor.map(_load_log_file, log_files)))
+
+
+def _load_log_file(file):
+    """Parse one log file into its records that have a timestamp and a message."""
     log_lines = []
-    for file in log_files:
-        with open(file) as f:
-            for line in f:
-                try:
-                    record = json.loads(line)
-                    if "timestamp" in record and "message" in record:
-                        log_lines.append(record)
-                except json.JSONDecodeError:
-                    continue
+    loads = _json.loads
+    with open(file, "rb") as f:  # Both JSON backends parse bytes, so skip decoding to str
+        for line in _read_lines(f):
+            if b'"message"' not in line:  # Cannot have the key, so skip the decode
+                continue
+            try:
+                record = loads(line)
+                if "timestamp" in record and "message" in record:
+                    log_lines.append(record)
+            except ValueError:  # JSONDecodeError of either backend
+                continue
     return log_lines
 
 
-def detect_recent_dense_block(log_lines, min_cluster_size=25, gap_seconds=30):
+def parse_timestamps(log_lines):
+    """
+    Parses the "timestamp" of every log line in one call.
+
+    Lines logged within the same millisecond share a string, and cache=True
+    converts each distinct string once. Pass the result to
+    detect_recent_dense_block() and parse_log_lines() so neither reparses.
+
+    Args:
+        log_lines: Object containing all the log lines.
+
+    Returns:
+        pd.DatetimeIndex: One timestamp per log line, in the same order.
+    """
+    return pd.to_datetime([line["timestamp"] for line in log_lines], format=_TIMESTAMP_FORMAT, cache=True)
+
+
+def detect_recent_dense_block(log_lines, min_cluster_size=25, gap_seconds=30, timestamps=None):
     """
     Detect the most recent cluster of densely occurring log entries.
 
@@ -53,6 +130,7 @@ def detect_recent_dense_block(log_lines, min_cluster_size=25, gap_seconds=30):
         log_lines (list): A list of dictionaries, each containing a "timestamp" key formatted as "%Y-%m-%d %H:%M:%S,%f".
         min_cluster_size (int, optional): Minimum number of timestamps required for a cluster to be considered valid. Default is 25.
         gap_seconds (float, optional): Maximum allowed gap in seconds between consecutive timestamps in a cluster. Default is 30.
+        timestamps (pd.DatetimeIndex, optional): parse_timestamps(log_lines), if already computed.
 
     Returns:
         tuple: A tuple (start_time, end_time) where:
@@ -60,35 +138,30 @@ def detect_recent_dense_block(log_lines, min_cluster_size=25, gap_seconds=30):
             - end_time (datetime): The latest timestamp in the most recent valid cluster.
             If no valid cluster is found, returns (None, None).
     """
-    timestamps = sorted([
-        datetime.strptime(line["timestamp"], "%Y-%m-%d %H:%M:%S,%f")
-        for line in log_lines
-    ])
-
-    if not timestamps:
+    if not log_lines:
         return None, None
 
-    clusters = []
-    cluster = [timestamps[0]]
+    # Packed microsecond values: the sort and the gaps run in NumPy, not on datetime objects
+    if timestamps is None:
+        timestamps = parse_timestamps(log_lines)
+    timestamps = timestamps.to_numpy().astype("datetime64[us]")
+    gaps = np.diff(timestamps).astype(np.int64)  # in microseconds
+    if (gaps < 0).any():  # Append-ordered logs are already sorted; sort only when they are not
+        timestamps = np.sort(timestamps)
+        gaps = np.diff(timestamps).astype(np.int64)
 
-    for curr, nxt in zip(timestamps, timestamps[1:]):
-        if (nxt - curr).total_seconds() <= gap_seconds:
-            cluster.append(nxt)
-        else:
-            if len(cluster) >= min_cluster_size:
-                clusters.append(cluster)
-            cluster = [nxt]
-    if len(cluster) >= min_cluster_size:
-        clusters.append(cluster)
-
-    if not clusters:
-        return None, None
+    # Clusters are the runs between gaps longer than gap_seconds
+    splits = np.flatnonzero(gaps > gap_seconds * 1_000_000) + 1
+    bounds = np.concatenate(([0], splits, [len(timestamps)]))
 
-    most_recent = clusters[-1]
-    return min(most_recent), max(most_recent)
+    # Walk back from the newest cluster and stop at the first large enough one
+    for first, stop in zip(bounds[-2::-1], bounds[:0:-1]):
+        if stop - first >= min_cluster_size:
+            return timestamps[first].item(), timestamps[stop - 1].item()
+    return None, None
 
 
-def parse_log_lines(log_lines, start_time=None, end_time=None) -> pd.DataFrame:
+def parse_log_lines(log_lines, start_time=None, end_time=None, timestamps=None) -> pd.DataFrame:
     """
     Parses log lines to identify the performance metrics of the function.
 
@@ -96,70 +169,63 @@ def parse_log_lines(log_lines, start_time=None, end_time=None) -> pd.DataFrame:
         log_lines: Object containing all the log lines.
         start_time (optional): Start time of the run. Defaults to None.
         end_time (optional): End time of the run. Defaults to None.
+        timestamps (optional): parse_timestamps(log_lines), if already computed.
 
     Returns:
         pd.DataFrame: Compiled pd.DataFrame 
     """
-    filtered_lines = [
-        line for line in log_lines
-        if start_time <= datetime.strptime(line["timestamp"], "%Y-%m-%d %H:%M:%S,%f") <= end_time
-    ]
-
-    pattern = re.compile(
-        r"(?P<func>[^\s:]+): (?P<type>start|end): wall=(?P<wall>[\d.]+) perf=(?P<perf>[\d.]+) id=(?P<id>[\w-]+)"
-        r"(?: duration=(?P<duration>[\d.]+)sec)? cpu=(?P<cpu>[\d.]+)% rss=(?P<rss>\d+) vms=(?P<vms>\d+)"
-        r" mem%=(?P<mem>[\d.]+) threads=(?P<threads>\d+) fds=(?P<fds>\d+)"
-    )
-
-    execution_data = defaultdict(dict)
-
-    for line in filtered_lines:
-        match = pattern.search(line["message"])
-        if match:
-            d = match.groupdict()
-            key = (d["func"], d["id"])
-            parsed = {
-                "wall": float(d["wall"]),
-                "perf": float(d["perf"]),
-                "cpu": float(d["cpu"]),
-                "rss": int(d["rss"]),
-                "vms": int(d["vms"]),
-                "mem_percent": float(d["mem"]),
-                "threads": int(d["threads"]),
-                "fds": int(d["fds"]),
-                "timestamp": datetime.strptime(line["timestamp"], "%Y-%m-%d %H:%M:%S,%f")
-            }
-            if d["duration"]:
-                parsed["duration"] = float(d["duration"])
-            execution_data[key][d["type"]] = parsed
-
-    records = []
-    for (func, id_), event in execution_data.items():
-        if "start" in event and "end" in event:
-            records.append({
-                "Function": func,
-                "Call ID": id_,
-                "Start Time": event["start"]["timestamp"],
-                "End Time": event["end"]["timestamp"],
-                "Wall Duration (s)": event["end"]["wall"] - event["start"]["wall"],
-                "Perf Duration (s)": event["end"]["perf"] - event["start"]["perf"],
-                "Duration (from log)": event["end"].get("duration", None),
-                "Start CPU (%)": event["start"]["cpu"],
-                "End CPU (%)": event["end"]["cpu"],
-                "Start RSS": event["start"]["rss"],
-                "End RSS": event["end"]["rss"],
-                "Start Mem %": event["start"]["mem_percent"],
-                "End Mem %": event["end"]["mem_percent"],
-                "Start Threads": event["start"]["threads"],
-                "End Threads": event["end"]["threads"],
-                "Start FDs": event["start"]["fds"],
-                "End FDs": event["end"]["fds"]
-            })
-
-    df = pd.DataFrame(records).sort_values("Start Time")
+    # One vectorized parse of every timestamp; to_datetime accepts 3- and 6-digit fractions
+    if timestamps is None:
+        timestamps = parse_timestamps(log_lines)
+    timestamps = pd.DatetimeIndex(timestamps)  # Positional indexing below, whatever was passed in
+    in_window = (timestamps >= start_time) & (timestamps <= end_time)
+    filtered_lines = list(itertools.compress(log_lines, in_window))
+    window_timestamps = timestamps[in_window]
+
+    # Only in-window messages become a column; a literal "wall=" test skips the regex on
+    # non-timing messages, and the rest get one extraction sweep
+    messages = pd.Series([line["message"] for line in filtered_lines], dtype=object).astype(str)
+    messages = messages[messages.str.contains("wall=", regex=False)]
+    events = messages.str.extract(_LOG_PATTERN)
+    events["timestamp"] = window_timestamps[messages.index]
+    events = events.dropna(subset=["func"]).astype(_EVENT_DTYPES)
+
+    # A repeated (func, id, type) keeps its last line, as the per-line loop did
+    keys = ["func", "id"]
+    starts = events[events["type"] == "start"].drop_duplicates(keys, keep="last")
+    ends = events[events["type"] == "end"].drop_duplicates(keys, keep="last")
+    calls = starts.merge(ends, on=keys, suffixes=("_start", "_end"))
+
+    df = pd.DataFrame({
+        "Function": calls["func"],
+        "Call ID": calls["id"],
+        "Start Time": calls["timestamp_start"],
+        "End Time": calls["timestamp_end"],
+        "Wall Duration (s)": calls["wall_end"] - calls["wall_start"],
+        "Perf Duration (s)": calls["perf_end"] - calls["perf_start"],
+        "Duration (from log)": calls["duration_end"],
+        "Start CPU (%)": calls["cpu_start"],
+        "End CPU (%)": calls["cpu_end"],
+        "Start RSS": calls["rss_start"],
+        "End RSS": calls["rss_end"],
+        "Start Mem %": calls["mem_start"],
+        "End Mem %": calls["mem_end"],
+        "Start Threads": calls["threads_start"],
+        "End Threads": calls["threads_end"],
+        "Start FDs": calls["fds_start"],
+        "End FDs": calls["fds_end"],
+    }).sort_values("Start Time", kind="stable")
     return df, filtered_lines
 
 
+_AGGREGATES = {
+    "Perf Duration (s)": ("count", "sum", "mean", "max"),
+    "CPU Delta": ("mean",),
+    "Memory Delta (MB)": ("mean",),
+}
+
+_HIST_DPI = 80  # The histogram grid grows with the number of functions; lower resolution saves render time
+
 def generate_plots(df: pd.DataFrame, output_dir: Path, subtitle: str):
     """
     Generates analytical plots and tables from extracted performance metrics.
@@ -176,12 +242,18 @@ def generate_plots(df: pd.DataFrame, output_dir: Path, subtitle: str):
         'weight': 'normal', 'size': 10, 'style': 'italic'
     }
 
+    # Categorical functions group faster and give every plot the same x order
+    df["Function"] = df["Function"].astype("category")
+    func = df["Function"]
+    start = df["Start Time"]
     df["CPU Delta"] = df["End CPU (%)"] - df["Start CPU (%)"]
     df["Memory Delta (MB)"] = (df["End RSS"] - df["Start RSS"]) / 1e6
-    df["Start Seconds"] = (df["Start Time"] - df["Start Time"].min()).dt.total_seconds()
+    df["Start Seconds"] = (start - start.min()).dt.total_seconds()
+
+    # One figure and canvas for the single-axes plots, cleared between them
+    fig = plt.figure(figsize=(12, 6))
 
     # Execution time per function
-    plt.figure(figsize=(12, 6))
     sns.boxplot(data=df, x="Function", y="Perf Duration (s)", orientation='vertical')
     plt.suptitle("Execution Time per Function")
     if subtitle:
@@ -190,10 +262,9 @@ def generate_plots(df: pd.DataFrame, output_dir: Path, subtitle: str):
     plt.grid(visible=True, axis='y')
     plt.tight_layout()
     plt.savefig(output_dir / "execution_time_per_function.png", bbox_inches='tight')
-    plt.close()
 
     # Function call timeline
-    plt.figure(figsize=(12, 6))
+    fig.clear()
     sns.scatterplot(data=df, x="Start Seconds", y="Function", size="Perf Duration (s)",
                     hue="Perf Duration (s)", palette="coolwarm", sizes=(20, 200))
     plt.suptitle("Function Calls Over Time")
@@ -203,10 +274,9 @@ def generate_plots(df: pd.DataFrame, output_dir: Path, subtitle: str):
     plt.grid(visible=True, axis='x')
     plt.tight_layout()
     plt.savefig(output_dir / "function_calls_over_time.png", bbox_inches='tight')
-    plt.close()
 
     # Memory delta per function
-    plt.figure(figsize=(12, 6))
+    fig.clear()
     sns.barplot(data=df, x="Function", y="Memory Delta (MB)")
     plt.suptitle("Memory Change per Function Call")
     if subtitle:
@@ -215,20 +285,18 @@ def generate_plots(df: pd.DataFrame, output_dir: Path, subtitle: str):
     plt.grid(visible=True, axis='y')
     plt.tight_layout()
     plt.savefig(output_dir / "memory_change_per_function_call.png", bbox_inches='tight')
-    plt.close()
 
     # Top 10 functions by total time
-    agg = df.groupby("Function").agg({
-        "Perf Duration (s)": ["count", "sum", "mean", "max"],
-        "CPU Delta": "mean",
-        "Memory Delta (MB)": "mean"
-    }).sort_values(("Perf Duration (s)", "sum"), ascending=False)
-    agg.columns = ['_'.join(col).strip() for col in agg.columns.values]
+    # Named aggregation builds the flat "<column>_<stat>" names directly, without a MultiIndex
+    agg = df.groupby(func, observed=True).agg(**{
+        f"{column}_{stat}": (column, stat)
+        for column, stats in _AGGREGATES.items() for stat in stats
+    }).sort_values("Perf Duration (s)_sum", ascending=False)
     top_funcs = agg.head(10).index
 
-    plt.figure(figsize=(12, 6))
-    sns.barplot(data=df[df["Function"].isin(top_funcs)],
-                x="Function", y="Perf Duration (s)")
+    fig.clear()
+    top_df = df.loc[func.isin(top_funcs)]
+    sns.barplot(data=top_df, x="Function", y="Perf Duration (s)", order=top_funcs)
     plt.suptitle("Top 10 Functions by Total Time")
     if subtitle:
         plt.title(subtitle, fontdict=font, y=1.05)
@@ -236,18 +304,20 @@ def generate_plots(df: pd.DataFrame, output_dir: Path, subtitle: str):
     plt.grid(visible=True, axis='y')
     plt.tight_layout()
     plt.savefig(output_dir / "top10_functions_by_total_time.png", bbox_inches='tight')
-    plt.close()
-
-    # Histograms for each function
-    for i, func in enumerate(df['Function'].unique()):
-        plt.figure(figsize=(4, 4))
-        sns.histplot(data=df[df["Function"] == func], x="Perf Duration (s)", bins=20)
-        plt.suptitle(f"Perf Duration for '{func}'")
-        if subtitle:
-            plt.title(subtitle, fontdict=font, y=1.05)
-        plt.tight_layout()
-        plt.savefig(output_dir / f"hist_{i+1}_{func}_perf_duration.png", bbox_inches='tight')
-        plt.close()
+    plt.close(fig)
+
+    # Histograms for each function: one faceted figure instead of a figure per function
+    grid = sns.displot(data=df, x="Perf Duration (s)", col="Function", col_wrap=4, height=3,
+                       bins=20, common_bins=False, facet_kws={"sharex": False, "sharey": False})
+    grid.set_titles("{col_name}")
+    fig = grid.figure
+    title_y = 1.0
+    if subtitle:
+        fig.text(0.5, 1.0, subtitle, fontdict=font, ha="center", va="bottom")
+        title_y += 16 / (72 * fig.get_figheight())  # Room for the subtitle: 16 points, as a figure fraction
+    fig.suptitle("Perf Duration per Function", y=title_y, va="bottom")
+    grid.savefig(output_dir / "hist_perf_duration_by_function.png", dpi=_HIST_DPI, bbox_inches='tight')
+    plt.close(fig)
 
     # Save data
     df.to_csv(output_dir / "results.csv", index=False)
@@ -265,19 +335,19 @@ def write_metadata(output_dir, start_time, end_time, subtitle, log_files):
         subtitle (str): Subtitle used in the plots. If empty, no subtitle was applied.
         log_files (iterable): List or iterable of log file paths used.
     """
+    lines = ["=== Timing Analysis Metadata ===", "Log files used:"]
+    lines.extend(f"  - {log}" for log in log_files)
+    lines.append(f"\nTime window: {start_time} → {end_time}")
+    lines.append(f"Subtitle:    {subtitle}\n")
     with open(output_dir / "README.txt", "w") as f:
-        f.write("=== Timing Analysis Metadata ===\n")
-        f.write("Log files used:\n")
-        for log in log_files:
-            f.write(f"  - {log}\n")
-        f.write(f"\nTime window: {start_time} → {end_time}\n")
-        f.write(f"Subtitle:    {subtitle}\n")
+        f.write("\n".join(lines))  # One write of the whole file
 
 
 def analysis(args=None):
     """
     Function for argument handling when running the script.
     """
+    plt.switch_backend("Agg")  # Plots are only written to PNG files, so skip any GUI backend
     parser = argparse.ArgumentParser(description="Parse timing logs and generate performance plots.")
     parser.add_argument("--logdir", type=str, required=True, help="Directory containing timing.log files")
     parser.add_argument("--subtitle", type=str, required=False, help='Subtitle for all plots. '
@@ -290,10 +360,12 @@ def analysis(args=None):
     args = parser.parse_args(args)
     logdir = Path(args.logdir)
 
-    log_lines = load_all_log_lines(logdir)
+    log_files = find_log_files(logdir)  # Listed once, for loading and for the metadata
+    log_lines = load_all_log_lines(logdir, log_files)
     if not log_lines:
         logger.warning("No valid log entries found in directory.")
         return
+    timestamps = parse_timestamps(log_lines)  # Shared by the window detection and the parse
 
     # Parse manual time overrides
     start_time = datetime.strptime(args.start_time, "%Y-%m-%d %H:%M:%S") if args.start_time else None
@@ -301,7 +373,7 @@ def analysis(args=None):
 
     # Auto-detect start and end time if not provided
     if not start_time or not end_time:
-        detected_start, detected_end = detect_recent_dense_block(log_lines)
+        detected_start, detected_end = detect_recent_dense_block(log_lines, timestamps=timestamps)
         if not detected_start:
             logger.warning("Could not detect a recent cluster of calls.")
             return
@@ -328,20 +400,20 @@ def analysis(args=None):
     logger.info(f"Time window: {start_time} → {end_time}")
     logger.info(f"Subtitle: {subtitle}")
 
-    df, filtered_lines = parse_log_lines(log_lines, start_time, end_time)
+    df, filtered_lines = parse_log_lines(log_lines, start_time, end_time, timestamps=timestamps)
     if df.empty:
         logger.warning("No function calls found in selected time window.")
         return
 
     # Save filtered raw logs
     raw_log_out = output_dir / "filtered_log_lines.log"
-    with open(raw_log_out, "w") as f:
-        for line in filtered_lines:
-            f.write(json.dumps(line) + "\n")
+    with open(raw_log_out, "wb") as f:
+        dumpb = _json.dumpb
+        f.writelines(dumpb(line) + b"\n" for line in filtered_lines)
 
     generate_plots(df, output_dir, subtitle)
-    write_metadata(output_dir, start_time, end_time, subtitle, sorted(logdir.glob("timing.log*")))
-    logger.info("Analysis complete. Results written to:", output_dir)
+    write_metadata(output_dir, start_time, end_time, subtitle, log_files)
+    logger.info("Analysis complete. Results written to: %s", output_dir)
 
 if __name__ == "__main__":
     analysis()
@@ -2,17 +2,62 @@
 
 import multiprocessing
 import atexit
-import json
 import os
+import queue
+import threading
+import time
 import logging
 from logging.handlers import RotatingFileHandler
 from datetime import datetime
 
+from pymaap import _json
+
 _log_queue = None
-_writer_process = None
+_writer_thread = None
 _log_file_path = None
+_event_logger = None
+_is_main_process = None  # cached multiprocessing.current_process().name == "MainProcess"
+
+def _reset_after_fork():
+    global _is_main_process, _log_queue, _writer_thread
+    _is_main_process = None  # Recomputed once multiprocessing has named the child
+    _log_queue = _writer_thread = None  # The writer thread stays with the parent
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_after_fork)
+
+def _get_event_logger():
+    """Return the "pymaap" logger, configuring it on first use only."""
+    global _event_logger
+    if _event_logger is None:
+        logger = logging.getLogger("pymaap")
+        logger.setLevel(logging.INFO)
+        if not logger.handlers:
+            handler = logging.StreamHandler()
+            handler.setFormatter(logging.Formatter("%(asctime)s - %(levelname)s - %(message)s"))
+            logger.addHandler(handler)
+        _event_logger = logger
+    return _event_logger
 
 class JSONFormatter(logging.Formatter):
+    """
+    One JSON object per record, encoded with orjson when available.
+
+    Timestamps keep logging's default "YYYY-MM-DD HH:MM:SS,mmm" layout, which
+    pymaap.analysis parses, but strftime only runs once per second.
+    """
+    _second_cache = (None, "")
+
+    def formatTime(self, record, datefmt=None):
+        if datefmt is not None:
+            return super().formatTime(record, datefmt)
+        second = int(record.created)
+        cached_second, prefix = self._second_cache
+        if second != cached_second:
+            prefix = time.strftime(self.default_time_format, self.converter(record.created))
+            self._second_cache = (second, prefix)
+        return self.default_msec_format % (prefix, record.msecs)
+
     def format(self, record):
         log_record = {
             "timestamp": self.formatTime(record),
@@ -21,72 +66,129 @@ class JSONFormatter(logging.Formatter):
             "function": getattr(record, "function_name", "N/A"),
             "uuid": getattr(record, "uuid", "N/A"),
         }
-        return json.dumps(log_record)
+        return _json.dumps(log_record)
 
-def _writer_worker(queue, log_file):
-    logger = logging.getLogger("mp_logger")
-    logger.setLevel(logging.INFO)
-    handler = RotatingFileHandler(log_file, maxBytes=10*1024*1024, backupCount=5)
-    handler.setFormatter(JSONFormatter())
-    logger.addHandler(handler)
+_STOP = None  # Sentinel that tells the writer thread to finish
 
-    while True:
-        record = queue.get()
-        if record == "STOP":
-            break
-        logger.handle(record)
+_WRITE_BATCH_SIZE = 256  # records formatted and written with one write() call
+
+def _writer_worker(log_queue, log_file):
+    # The handler is kept for its file handling and rotation; records are written in batches
+    handler = RotatingFileHandler(log_file, maxBytes=10*1024*1024, backupCount=5)
+    formatter = JSONFormatter()
+    errors = getattr(handler, "errors", None) or "strict"  # FileHandler.errors is Python 3.9+
+    get_nowait = log_queue.get_nowait
+    running = True
+    try:
+        while running:
+            # Block for one record, then take whatever else is already queued
+            batch = [log_queue.get()]
+            while len(batch) < _WRITE_BATCH_SIZE:
+                try:
+                    batch.append(get_nowait())
+                except queue.Empty:
+                    break
+            if _STOP in batch:
+                batch = batch[:batch.index(_STOP)]
+                running = False
+            if not batch:
+                continue
+            stream = handler.stream
+            size = stream.tell()
+            lines = []
+            for record in batch:
+                # One bad record must not take the writer thread down with it
+                try:
+                    line = formatter.format(record) + "\n"
+                    # maxBytes counts bytes; only non-ASCII text needs encoding to measure
+                    length = len(line) if line.isascii() else len(line.encode(stream.encoding, errors))
+                    if size and size + length >= handler.maxBytes:  # Same rule as shouldRollover()
+                        stream.write("".join(lines))
+                        lines.clear()
+                        handler.doRollover()
+                        stream = handler.stream
+                        size = 0
+                    lines.append(line)
+                    size += length
+                except Exception:
+                    handler.handleError(record)
+            try:
+                stream.write("".join(lines))
+                stream.flush()  # One write and flush per batch instead of per record
+            except Exception:
+                handler.handleError(batch[-1])
+    finally:
+        handler.close()
 
 def init_multiprocessing_logging(log_file="logs/timing.log"):
-    global _log_queue, _writer_process, _log_file_path
+    """
+    Start the background writer that log_event() hands records to.
+
+    Records go through a queue.SimpleQueue to a daemon thread in this process,
+    so they are never pickled or sent through a pipe. Only the main process
+    uses the writer; worker processes (and forked children) log to their own stderr.
+    """
+    global _log_queue, _writer_thread, _log_file_path
 
     os.makedirs(os.path.dirname(log_file), exist_ok=True)
-    _log_queue = multiprocessing.Queue()
+    _log_queue = queue.SimpleQueue()
     _log_file_path = log_file
-    _writer_process = multiprocessing.Process(target=_writer_worker, args=(_log_queue, log_file))
-    _writer_process.start()
+    _writer_thread = threading.Thread(target=_writer_worker, args=(_log_queue, log_file),
+                                      name="pymaap-log-writer", daemon=True)
+    _writer_thread.start()
 
     # Ensure it shuts down cleanly
     atexit.register(shutdown_multiprocessing_logging)
 
 def shutdown_multiprocessing_logging():
-    global _log_queue, _writer_process
-    if _log_queue and _writer_process and _writer_process.is_alive():
-        _log_queue.put("STOP")
-        _writer_process.join()
-    # if _log_queue:
-    #     _log_queue.put("STOP")
-    # if _writer_process:
-    #     _writer_process.join()
+    """Write out queued records and stop the writer; later events go to the "pymaap" logger."""
+    global _log_queue, _writer_thread
+    if _log_queue is not None and _writer_thread is not None and _writer_thread.is_alive():
+        _log_queue.put(_STOP)
+        _writer_thread.join()
+    _log_queue = None
+    _writer_thread = None
 
 def get_log_queue():
     return _log_queue
 
-def log_event(level, msg, extra=None):
+def log_event(level, msg, *args, extra=None, created=None):
     """
     Log an event to the appropriate backend: queue (if active) or std logging.
+
+    `msg` is %-formatted with `args` only when a handler renders the record.
+    `created` (epoch seconds) overrides the record time, for events logged
+    after the fact by a background thread.
     """
+    global _is_main_process
+    # Only main process should push to the queue; workers log to their own stderr
+    use_queue = False
+    if _log_queue:
+        if _is_main_process is None:
+            _is_main_process = multiprocessing.current_process().name == "MainProcess"
+        use_queue = _is_main_process
+    if not use_queue:
+        logger = _get_event_logger()
+        if not logger.isEnabledFor(level):
+            return
+
     record = logging.LogRecord(
         name="pymaap",
         level=level,
         pathname=__file__,
         lineno=0,
         msg=msg,
-        args=(),
+        args=args,
         exc_info=None
     )
+    if created is not None:
+        record.created = created
+        record.msecs = int((created - int(created)) * 1000) + 0.0
     if extra:
         for k, v in extra.items():
             setattr(record, k, v)
 
-    log_queue = get_log_queue()
-    # Only main process should push to the queue; workers log to their own stderr
-    if log_queue and multiprocessing.current_process().name == "MainProcess":
-        log_queue.put(record)
+    if use_queue:
+        _log_queue.put(record)
     else:
-        logger = logging.getLogger("pymaap")
-        logger.setLevel(logging.INFO)
-        if not logger.handlers:
-            handler = logging.StreamHandler()
-            handler.setFormatter(logging.Formatter("%(asctime)s - %(levelname)s - %(message)s"))
-            logger.addHandler(handler)
         logger.handle(record)
@@ -1,51 +1,144 @@
 # pymaap/logging_setup.py
 
-import datetime
+import collections
 import logging
-import uuid
-import json
+import os
+import sys
+import time
 from pathlib import Path
 from logging.handlers import RotatingFileHandler
 from logging import StreamHandler
 from typing import Optional
 import types
+import weakref
 from datetime import datetime
 
+from pymaap import _json
+
+# Maps a random hex digit onto the RFC 4122 variant digits 8, 9, a and b
+_VARIANT_DIGITS = {d: "89ab"[int(d, 16) & 3] for d in "0123456789abcdef"}
+
+_UUID_BATCH = 1024  # UUIDs drawn from one os.urandom call
+_uuid_pool = collections.deque()  # Pre-formatted UUID4 strings; popleft() is thread-safe
+
+def _uuid4_batch() -> str:
+    """
+    Refill _uuid_pool with random UUID4 strings and return one more.
+
+    One os.urandom call covers the whole batch and the formatting runs in a
+    single comprehension, without building uuid.UUID objects.
+    """
+    h = os.urandom(16 * _UUID_BATCH).hex()
+    ids = [
+        f"{h[i:i + 8]}-{h[i + 8:i + 12]}-4{h[i + 13:i + 16]}-{_VARIANT_DIGITS[h[i + 16]]}{h[i + 17:i + 20]}-{h[i + 20:i + 32]}"
+        for i in range(0, 32 * _UUID_BATCH, 32)
+    ]
+    _uuid_pool.extend(ids[1:])
+    return ids[0]
+
+if hasattr(os, "register_at_fork"):
+    # A forked child must not hand out the UUIDs its parent still holds
+    os.register_at_fork(after_in_child=_uuid_pool.clear)
+
 class UUIDFilter(logging.Filter):
     """
     Injects a unique UUID into each LogRecord as `record.uuid` for cross-log correlation.
     """
     def filter(self, record: logging.LogRecord) -> bool:
-        record.uuid = str(uuid.uuid4())
+        # The logger and every handler run this filter; only the first pass draws a UUID,
+        # so the text and JSON lines of one record share it
+        if not hasattr(record, "uuid"):
+            try:
+                record.uuid = _uuid_pool.popleft()
+            except IndexError:
+                record.uuid = _uuid4_batch()
         return True
 
 class JSONFormatter(logging.Formatter):
     """
     Formats LogRecords as JSON objects, one per line,
-    with full microsecond precision in the timestamp.
+    with millisecond precision in the timestamp.
     Fields: timestamp, level, message, function, uuid
     """
+    _second_cache = (None, "")  # (epoch second, its "%Y-%m-%d %H:%M:%S" text)
+
     def formatTime(self, record, datefmt: Optional[str] = None) -> str:
         # record.created is a float UNIX timestamp
-        dt = datetime.fromtimestamp(record.created)
         if datefmt:
             # strftime supports %f for microseconds
-            return dt.strftime(datefmt)
-        # fallback if no format given
-        return dt.strftime("%Y-%m-%d %H:%M:%S.%f")[:-3]
+            return datetime.fromtimestamp(record.created).strftime(datefmt)
+        # "YYYY-MM-DD HH:MM:SS.mmm"; strftime only runs once per second
+        second = int(record.created)
+        cached_second, prefix = self._second_cache
+        if second != cached_second:
+            prefix = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(second))
+            self._second_cache = (second, prefix)
+        return "%s.%03d" % (prefix, record.msecs)
 
     def format(self, record: logging.LogRecord) -> str:
-        # include full microseconds
-        timestamp = self.formatTime(record, "%Y-%m-%d %H:%M:%S.%f")[:-3]
         log_record = {
-            "timestamp": timestamp,
+            "timestamp": self.formatTime(record),
             "level":     record.levelname,
             "message":   record.getMessage(),
             "function":  record.funcName or "N/A",
             "uuid":      getattr(record, "uuid", "N/A"),
         }
-        return json.dumps(log_record)
-        
+        return _json.dumps(log_record)
+
+_SIZE_REFRESH_RECORDS = 100  # records between re-reads of the real file size
+_tracked_handlers = weakref.WeakSet()  # Handlers using _emit_with_tracked_size
+
+def _forget_tracked_sizes() -> None:
+    """Make every tracked handler re-read its file size; runs in a forked child."""
+    for handler in _tracked_handlers:
+        handler._size = None
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_forget_tracked_sizes)
+
+def _emit_with_tracked_size(self, record: logging.LogRecord) -> None:
+    """
+    RotatingFileHandler.emit without the per-record rollover probe.
+
+    The stock shouldRollover() stats the path twice, seeks to the end and
+    formats the record a second time on every call; this formats once and
+    keeps a running size in encoded bytes. The size is re-read from the
+    stream when it is (re)opened, after a fork, before rotating and every
+    _SIZE_REFRESH_RECORDS records, in case another process appends to the file.
+    """
+    try:
+        if self.stream is None:  # delay=True, or emitted after close(); as FileHandler.emit()
+            if self.mode == "w" and getattr(self, "_closed", False):
+                return
+            self.stream = self._open()
+            self._size = None
+        msg = self.format(record) + self.terminator
+        # maxBytes counts bytes; only non-ASCII text needs encoding to measure
+        length = len(msg) if msg.isascii() else len(msg.encode(self.stream.encoding, getattr(self, "errors", None) or "strict"))
+        self._unchecked -= 1
+        if self._size is None or self._unchecked < 0 or (self._size and self._size + length >= self.maxBytes):
+            self._size = self.stream.seek(0, 2)
+            self._unchecked = _SIZE_REFRESH_RECORDS
+            if self._size and self._size + length >= self.maxBytes:  # Same rule as shouldRollover()
+                self.doRollover()
+                if self.stream is None:  # doRollover() leaves it closed when delay=True
+                    self.stream = self._open()
+                self._size = self.stream.seek(0, 2)
+        self.stream.write(msg)
+        self.stream.flush()
+        self._size += length
+    except Exception:
+        self.handleError(record)
+
+def _track_rollover_size(handler: RotatingFileHandler) -> None:
+    """Swap in _emit_with_tracked_size for a size-rotated handler on a regular file."""
+    # Like shouldRollover(), never rotate anything other than a regular file (bpo-45401)
+    if handler.maxBytes > 0 and os.path.isfile(handler.baseFilename):
+        handler._size = None  # Read from the stream on the first emit
+        handler._unchecked = 0
+        handler.emit = types.MethodType(_emit_with_tracked_size, handler)
+        _tracked_handlers.add(handler)
+
 def init_general_logger(
     name: Optional[str] = None,
     log_dir: str = "logs",
@@ -61,7 +154,7 @@ def init_general_logger(
     Sets up:
       - RotatingFileHandler writing plain-text logs to <log_dir>/<general_log>
       - Optional RotatingFileHandler writing JSON logs to <log_dir>/<json_log>
-      - Console output via print(), at the specified console_level
+      - Console output to sys.stdout, at the specified console_level
     File handlers are verbose (include UUID), console handler is concise (no UUID).
 
     Parameters:
@@ -80,7 +173,8 @@ def init_general_logger(
     logger = logging.getLogger(name) if name else logging.getLogger()
 
     # Ensure log directory exists
-    Path(log_dir).mkdir(parents=True, exist_ok=True)
+    log_dir = Path(log_dir)
+    log_dir.mkdir(parents=True, exist_ok=True)
 
     # Clear existing handlers and filters
     logger.handlers.clear()
@@ -106,7 +200,7 @@ def init_general_logger(
 
     # Plain-text rotating file handler
     text_handler = RotatingFileHandler(
-        Path(log_dir) / general_log,
+        str(log_dir / general_log),
         maxBytes=max_bytes,
         backupCount=backup_count,
     )
@@ -115,12 +209,13 @@ def init_general_logger(
     text_handler.addFilter(uuid_filter)
     # Custom naming for rotated backups
     text_handler.namer = lambda name: f"{name}.log"
+    _track_rollover_size(text_handler)
     logger.addHandler(text_handler)
 
     # JSON rotating file handler
     if json_log:
         json_handler = RotatingFileHandler(
-            Path(log_dir) / json_log,
+            str(log_dir / json_log),
             maxBytes=max_bytes,
             backupCount=backup_count,
         )
@@ -128,9 +223,10 @@ def init_general_logger(
         json_handler.setFormatter(JSONFormatter())
         json_handler.addFilter(uuid_filter)
         json_handler.namer = lambda name: f"{name}.log"
+        _track_rollover_size(json_handler)
         logger.addHandler(json_handler)
 
-    # Console handler using print for capture-friendly output
+    # Console handler writing to the current sys.stdout for capture-friendly output
     console_handler = StreamHandler()
     console_handler.setLevel(console_level)
     console_handler.setFormatter(console_fmt)
@@ -138,12 +234,12 @@ def init_general_logger(
 
     def emit(self, record: logging.LogRecord) -> None:
         try:
-            msg = self.format(record)
-            print(msg)
+            # Looked up per record, like print(), but one write call instead of print's two
+            sys.stdout.write(self.format(record) + self.terminator)
         except Exception:
             self.handleError(record)
 
-    # Monkey-patch emit on this instance to use print()
+    # Monkey-patch emit on this instance to write to sys.stdout
     console_handler.emit = types.MethodType(emit, console_handler)
     logger.addHandler(console_handler)
 
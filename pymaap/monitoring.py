@@ -1,26 +1,86 @@
 # pymaap/monitoring.py
 
-import json
+import abc
+import atexit
+import bisect
 import logging
 import os
+import shutil
+import sys
 import csv
 import functools
+import glob
+import itertools
+import operator
+import threading
 import time
-import psutil
 import uuid
+import psutil
+import queue
+import random
 import multiprocessing
-from datetime import datetime
-import pandas as pd
-import geopandas as gpd
+import multiprocessing.util
+import pyarrow as pa
+import pyarrow.feather as feather
+import pyarrow.parquet as pq
 from logging.handlers import RotatingFileHandler, QueueHandler, QueueListener
-import inspect
 
-from pymaap.logging_backend import get_log_queue, log_event
+from pymaap import _json
+from pymaap._log_re import END_FORMAT, START_FORMAT
+from pymaap.logging_backend import JSONFormatter, get_log_queue, log_event
 from pymaap.logging_setup import init_general_logger
 logger = init_general_logger(__name__)
 
 # --- Helpers ---
 
+process = psutil.Process()
+_pid = os.getpid()
+_cpu_count = multiprocessing.cpu_count()  # Fixed for the machine, so read once
+
+def _reset_after_fork():
+    """Point process-level state at the child after os.fork()."""
+    global process, _pid
+    process = psutil.Process()
+    _pid = os.getpid()
+    _rng.seed(os.urandom(16))  # Otherwise the child repeats the parent's call IDs
+    for sampler in _samplers.values():
+        sampler.running = False  # Threads do not survive a fork
+    _record_writer.reset()
+    _restart_log_listener()
+
+# Per-call correlation IDs: 64 random bits from a generator seeded once from
+# os.urandom, instead of a urandom read and uuid formatting on every call
+_rng = random.Random(os.urandom(16))
+
+def _new_call_id():
+    """Return a 16-character hex ID for one decorated or manually tracked call."""
+    return format(_rng.getrandbits(64), "016x")
+
+def _new_uuid4():
+    """Return a standard UUID4 string, for use_uuid4=True; reads os.urandom on every call."""
+    return str(uuid.uuid4())
+
+def _restart_log_listener():
+    """Give the child its own in-process log queue and listener thread."""
+    listener = _log_listener
+    if listener is None or not isinstance(listener.queue, queue.SimpleQueue):
+        return  # multiprocessing queues are shared with the parent's listener
+    fresh = queue.SimpleQueue()
+    for handler in logging.getLogger().handlers:
+        if isinstance(handler, QueueHandler) and handler.queue is listener.queue:
+            handler.queue = fresh
+    listener.queue = fresh
+    listener._thread = None  # The parent's thread did not survive the fork
+    listener.start()
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_after_fork)
+
+# Argument types whose str() cannot raise; _safe_serialize skips the try/except for them
+_PRIMITIVE_TYPES = frozenset({int, float, bool, type(None)})
+
+_DIGIT_TRANS = str.maketrans("0123456789", "**********")
+
 def sanitizer(arg_str):
     """
     Example sanitizer that replaces any digits with '*'.
@@ -28,32 +88,659 @@ def sanitizer(arg_str):
       timer = Timer(max_arg_length=100, sanitize_func=sanitizer)
       error_handler = ErrorCatcher(sanitize_func=sanitizer)
     """
-    return ''.join('*' if c.isdigit() else c for c in arg_str)
-
-class JSONFormatter(logging.Formatter):
-    """Formats JSON"""
-    def format(self, record):
-        log_record = {
-            "timestamp": self.formatTime(record),
-            "level": record.levelname,
-            "message": record.getMessage(),
-            "function": record.__dict__.get("function_name", "N/A"),
-            "uuid": record.__dict__.get("uuid", "N/A")
-        }
-        return json.dumps(log_record)
+    return arg_str.translate(_DIGIT_TRANS)
+
+def _read_resources():
+    """Return (CPU seconds, RSS in MB) of the current process."""
+    cpu_times = process.cpu_times()
+    return cpu_times.user + cpu_times.system, process.memory_info().rss / (1024 ** 2)
+
+_MAX_PEAK_ENTRIES = 10_000  # bound on the sampler's peak history
+
+class _ResourceSampler:
+    """
+    Background thread that polls CPU time and RSS of the current process.
+
+    Used by Timer(sampling_mode=True): the wrapper reads the latest sample
+    instead of calling psutil itself, so values can be up to `interval`
+    seconds stale but no syscalls are made on the decorated call. Samples
+    are numbered, so a call can tell whether any sample landed inside it
+    and ask for the highest RSS sampled since it started.
+    """
+    def __init__(self, interval):
+        self.interval = interval
+        self.latest = (0, 0.0, 0.0)  # (generation, CPU seconds, RSS in MB), replaced as one tuple
+        self.running = False
+        self._lock = threading.Lock()
+        # Suffix maxima of the RSS samples: generations ascend and RSS strictly
+        # descends, so the first entry after generation g is the peak since g
+        self._peak_generations = []
+        self._peak_rss = []
+        self._peak_lock = threading.Lock()
+
+    def ensure_running(self):
+        """Start the sampling thread if it is not running in this process."""
+        with self._lock:
+            if not self.running:
+                self._sample()
+                threading.Thread(target=self._run, name="pymaap-sampler", daemon=True).start()
+                self.running = True
+
+    def read(self):
+        """Return the latest (generation, CPU seconds, RSS in MB) sample."""
+        if not self.running:
+            self.ensure_running()
+        return self.latest
+
+    def read_since(self, generation):
+        """
+        Return (CPU seconds, RSS in MB, peak RSS in MB) for the samples after `generation`.
+
+        None if no sample has been taken since then.
+        """
+        with self._peak_lock:  # The latest sample and the peaks are updated together
+            latest_generation, cpu, rss_mb = self.latest
+            if latest_generation == generation:
+                return None
+            i = bisect.bisect_right(self._peak_generations, generation)
+            return cpu, rss_mb, self._peak_rss[i] if i < len(self._peak_rss) else rss_mb
+
+    def _sample(self):
+        cpu, rss_mb = _read_resources()
+        with self._peak_lock:
+            generations, peaks = self._peak_generations, self._peak_rss
+            while peaks and peaks[-1] <= rss_mb:  # No longer the peak of any later window
+                generations.pop()
+                peaks.pop()
+            generation = self.latest[0] + 1
+            generations.append(generation)
+            peaks.append(rss_mb)
+            if len(peaks) > _MAX_PEAK_ENTRIES:  # Only a long stretch of falling RSS gets here
+                del generations[0], peaks[0]
+            self.latest = (generation, cpu, rss_mb)
+
+    def _run(self):
+        while True:
+            time.sleep(self.interval)
+            self._sample()
+
+_samplers = {}
+_samplers_lock = threading.Lock()
+
+def _get_sampler(interval):
+    """Return the sampler polling at `interval` seconds, shared between Timers."""
+    with _samplers_lock:
+        sampler = _samplers.get(interval)
+        if sampler is None:
+            sampler = _samplers[interval] = _ResourceSampler(interval)
+        return sampler
+
+# --- Results persistence ---
+
+# Calls record time.time_ns(); Arrow formats store it as is, marked as UTC, and CSV
+# formats it in local time on write. Readers convert with .dt.tz_convert()
+_TIMESTAMP_TYPE = pa.timestamp("ns", tz="UTC")
+
+_TIMING_SCHEMA = pa.schema([
+    ("Timestamp", _TIMESTAMP_TYPE),
+    ("Process ID", pa.int64()),
+    ("Thread Count", pa.int64()),
+    ("UUID", pa.string()),
+    ("Function Name", pa.string()),
+    ("Execution Time (s)", pa.float64()),
+    ("CPU Time (sec)", pa.float64()),
+    ("Memory Change (MB)", pa.float64()),
+    ("Final Memory Usage (MB)", pa.float64()),
+    ("Arguments", pa.string()),
+    ("Log Message", pa.string()),
+])
+
+_ERROR_SCHEMA = pa.schema([
+    ("Timestamp", _TIMESTAMP_TYPE),
+    ("UUID", pa.string()),
+    ("Function Name", pa.string()),
+    ("Error Message", pa.string()),
+    ("Arguments", pa.string()),
+])
+
+def _conform_table(table, schema):
+    """Select and cast `table` to `schema`; raises KeyError/ValueError for another layout."""
+    table = table.select(schema.names)
+    for i, field in enumerate(schema):
+        column = table.column(i)
+        if field.type == _TIMESTAMP_TYPE and (pa.types.is_string(column.type) or pa.types.is_large_string(column.type)):
+            # Older versions stored local "%Y-%m-%d %H:%M:%S" text; a plain cast would read it as UTC
+            seconds = [None if text is None else time.mktime(time.strptime(text, "%Y-%m-%d %H:%M:%S"))
+                       for text in column.to_pylist()]
+            ns = [None if value is None else int(value) * 1_000_000_000 for value in seconds]
+            table = table.set_column(i, field.name, pa.array(ns, type=field.type))
+    return table.cast(schema)
+
+_ARROW_BATCH_SIZE = 512  # rows buffered in memory before a batch is written
+_ARROW_PUBLISH_INTERVAL = 10.0  # seconds a writer stays open before sync() closes it
+
+def _temp_path(path):
+    """Hidden name `path` is written under; pyarrow datasets skip dot files."""
+    directory, name = os.path.split(path)
+    return os.path.join(directory, f".{name}.tmp")
+
+def _write_table_atomically(write, table, path, **kwargs):
+    """Write `table` with write(table, file, ...) under a temporary name, then rename it to `path`."""
+    write(table, _temp_path(path), **kwargs)
+    os.replace(_temp_path(path), path)
+
+class _ArrowSink(abc.ABC):
+    """
+    Appends rows to a columnar results file through a single long-lived writer.
+
+    Rows are buffered column by column and written as one record batch every
+    _ARROW_BATCH_SIZE rows, so each call costs O(1) instead of re-reading and
+    rewriting the whole file.
+    Rows only become readable once the writer is closed, by flush() or by the
+    first sync() after it has been open _ARROW_PUBLISH_INTERVAL seconds. The writer
+    fills a hidden temporary file, which is renamed over the final path
+    when it closes, so a process dying mid-write never leaves a truncated
+    file where readers look. Subclasses create the file and open the writer
+    for a concrete file format.
+    """
+    def __init__(self, path, schema):
+        self.path = path
+        self.schema = schema
+        self._columns = [[] for _ in schema]
+        self._buffered = 0
+        self._writer = None
+        self._writer_path = None  # Final path of the file the writer is filling
+        self._opened_at = 0.0
+        self._lock = threading.Lock()
+
+    def write_rows(self, rows):
+        with self._lock:
+            # Transpose each batch once here, so no row tuples are kept around
+            for column, values in zip(self._columns, zip(*rows)):
+                column.extend(values)
+            self._buffered += len(rows)
+            if self._buffered >= _ARROW_BATCH_SIZE:
+                self._write_buffer()
+
+    def sync(self):
+        """
+        Write buffered rows as a batch, closing the writer if it has been open long enough.
+
+        Returns True while rows are still unpublished, so the caller syncs again later.
+        """
+        with self._lock:
+            if self._writer is not None and time.monotonic() - self._opened_at >= _ARROW_PUBLISH_INTERVAL:
+                self._close()  # Bounds what a killed process loses
+            else:
+                self._write_buffer()
+            return self._writer is not None
+
+    def flush(self):
+        """Write buffered rows and close the writer so the file is complete on disk."""
+        with self._lock:
+            self._close()
+
+    def _close(self):
+        self._write_buffer()
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+            os.replace(_temp_path(self._writer_path), self._writer_path)
+
+    @abc.abstractmethod
+    def create_empty(self):
+        """Write a file holding only the schema."""
+
+    @abc.abstractmethod
+    def _open_writer(self):
+        """Point self._writer at _temp_path(self._writer_path) for the rows written from now on."""
+
+    def _write_buffer(self):
+        if not self._buffered:
+            return
+        if self._writer is None:
+            self._open_writer()
+            self._opened_at = time.monotonic()
+        # Build each column straight into its Arrow type
+        arrays = [pa.array(column, type=field.type)
+                  for column, field in zip(self._columns, self.schema)]
+        self._write_batch(pa.RecordBatch.from_arrays(arrays, schema=self.schema))
+        for column in self._columns:
+            column.clear()
+        self._buffered = 0
+
+    def _write_batch(self, batch):
+        self._writer.write_batch(batch)
+
+class _ParquetSink(_ArrowSink):
+    """
+    Snappy-compressed Parquet dataset: a directory of part files, one row group per batch.
+
+    Each writer session (up to the next flush() or publish) goes to a new part file, so
+    reopening never reads earlier rows back. pandas.read_parquet() and
+    pyarrow.dataset.dataset() read the directory as one table. Batches are
+    held as Arrow data and written as row groups of up to row_group_size
+    rows: a part only joins the dataset once its writer closes anyway, and
+    bigger row groups compress and scan better.
+    """
+    compression = "snappy"
+    row_group_size = 65_536
+
+    def __init__(self, path, schema):
+        super().__init__(path, schema)
+        self._pending = []  # Record batches not yet written as a row group
+        self._pending_rows = 0
+
+    def _write_batch(self, batch):
+        self._pending.append(batch)
+        self._pending_rows += batch.num_rows
+        if self._pending_rows >= self.row_group_size:
+            self._write_row_group()
+
+    def _write_row_group(self):
+        if self._pending:
+            self._writer.write_table(pa.Table.from_batches(self._pending), row_group_size=self.row_group_size)
+            self._pending = []
+            self._pending_rows = 0
+
+    def _close(self):
+        self._write_buffer()
+        self._write_row_group()
+        super()._close()
+
+    def create_empty(self):
+        self._prepare_dir()
+        _write_table_atomically(pq.write_table, self.schema.empty_table(), self._new_part_path(),
+                                compression=self.compression)
+
+    def _open_writer(self):
+        self._prepare_dir()
+        self._writer_path = self._new_part_path()
+        self._writer = pq.ParquetWriter(_temp_path(self._writer_path), self.schema, compression=self.compression)
+
+    def _new_part_path(self):
+        # Time first so parts sort in write order; the pid keeps processes apart
+        return os.path.join(self.path, f"part-{time.time_ns()}-{_pid}.parquet")
+
+    def _prepare_dir(self):
+        if os.path.isfile(self.path):
+            self._migrate_single_file()
+        os.makedirs(self.path, exist_ok=True)
+
+    def _migrate_single_file(self):
+        """Move a results file written by older versions into the dataset directory."""
+        try:
+            existing = _conform_table(pq.read_table(self.path), self.schema)
+        except (KeyError, ValueError):
+            os.replace(self.path, self.path + ".bak")  # Unknown layout; keep it out of the dataset
+            return
+        os.remove(self.path)
+        os.makedirs(self.path, exist_ok=True)
+        _write_table_atomically(pq.write_table, existing, self._new_part_path(), compression=self.compression)
+
+class _FeatherSink(_ArrowSink):
+    """
+    LZ4-compressed Feather (Arrow IPC) file; cheaper to write than Parquet.
+
+    Each writer session writes a new file, so opening it carries the rows
+    already in the file forward once; the old file stays readable until
+    the new one replaces it.
+    """
+    compression = "lz4"
+
+    def create_empty(self):
+        _write_table_atomically(feather.write_feather, self.schema.empty_table(), self.path,
+                                compression=self.compression)
+
+    def _open_writer(self):
+        try:
+            # Read fully into memory: the file is replaced when the writer closes
+            existing = feather.read_table(self.path, memory_map=False)
+            existing = _conform_table(existing, self.schema)
+        except (FileNotFoundError, KeyError, ValueError):
+            existing = None  # File does not exist, is empty, or has an unknown layout
+        options = pa.ipc.IpcWriteOptions(compression=self.compression)
+        self._writer_path = self.path
+        self._writer = pa.ipc.new_file(_temp_path(self.path), self.schema, options=options)
+        if existing is not None and existing.num_rows:
+            self._writer.write_table(existing)
+
+_timestamp_cache = (None, "")  # (epoch second, its formatted text)
+
+def _format_timestamp(timestamp_ns):
+    """Render a time.time_ns() value in local time, as the CSV results have always stored it."""
+    global _timestamp_cache
+    second = timestamp_ns // 1_000_000_000
+    cached_second, text = _timestamp_cache
+    if second != cached_second:  # strftime runs once per wall-clock second, not per row
+        text = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(second))
+        _timestamp_cache = (second, text)
+    return text
+
+class _CsvSink:
+    """
+    Appends rows to a CSV file through one persistent, buffered file handle.
+
+    Keeping the handle open avoids an open/close pair and a new csv.writer on
+    every call; rows reach the disk when the buffer fills, on sync(), or on
+    flush(), which also closes the handle so the next write reopens the file.
+    The handle is closed before os.fork(), so each process appends through
+    its own handle and a child never re-writes rows buffered by its parent.
+    """
+    def __init__(self, path, schema):
+        self.path = path
+        self.header = schema.names
+        self._timestamp_cols = [i for i, field in enumerate(schema) if field.type == _TIMESTAMP_TYPE]
+        self._fh = None
+        self._writer = None
+        self._lock = threading.Lock()
+
+    def open(self):
+        """Open the handle now; returns True if the file was empty and got a header."""
+        with self._lock:
+            return self._fh is None and self._open()
+
+    def _open(self):
+        # Append mode creates the file if needed, so no separate existence check
+        self._fh = open(self.path, "a", newline="", buffering=1 << 20)
+        self._writer = csv.writer(self._fh)
+        if self._fh.tell() == 0:  # New, or emptied since the decorator was created
+            self._writer.writerow(self.header)
+            self._fh.flush()  # Readers see the header before the first rows arrive
+            return True
+        return False
+
+    def write_rows(self, rows):
+        with self._lock:
+            if self._fh is None:
+                self._open()
+            if self._timestamp_cols:
+                rows = [list(row) for row in rows]
+                for row in rows:
+                    for i in self._timestamp_cols:
+                        row[i] = _format_timestamp(row[i])
+            self._writer.writerows(rows)  # One C-level loop per batch
+
+    def sync(self):
+        """Write buffered rows, keeping the handle open; nothing is left unpublished."""
+        with self._lock:
+            if self._fh is not None:
+                self._fh.flush()
+        return False
+
+    def flush(self):
+        """Write buffered rows and close the handle."""
+        with self._lock:
+            self._close()
+
+    def _close(self):
+        if self._fh is not None:
+            self._fh.close()
+            self._fh = None
+            self._writer = None
+
+_sinks = {}
+_sinks_lock = threading.Lock()
+
+def _get_sink(path, sink_cls, *args):
+    """Return the sink for `path`, shared by every decorator writing to that file."""
+    with _sinks_lock:
+        sink = _sinks.get(path)
+        if sink is None:
+            sink = _sinks[path] = sink_cls(path, *args)
+        return sink
+
+_RECORD_QUEUE_SIZE = 10_000  # pending rows before decorated calls wait for the writer
+_WRITER_BATCH_SIZE = 256  # records taken off the queue per write
+_SYNC_INTERVAL = 1.0  # seconds rows may wait in sink buffers while calls keep coming
+
+class _RecordWriter:
+    """
+    Single background thread that persists results rows for every decorator.
+
+    Decorated calls only enqueue a (callable, record) pair. The thread drains
+    up to _WRITER_BATCH_SIZE pairs at a time and hands each run of records for
+    the same callable over as one list, so file I/O never lands inside the
+    measured code path and sinks write whole batches. Rows left in sink
+    buffers are synced to the files at most _SYNC_INTERVAL seconds after they
+    were written, and syncing repeats until every sink reports its rows
+    published. The queue is bounded, and a full queue makes callers wait
+    instead of dropping rows.
+    """
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self.reset()
+
+    def reset(self):
+        """Start over with an empty queue and no thread (also used after fork)."""
+        self.queue = queue.Queue(self.maxsize)
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def put(self, func, record):
+        if self._thread is None:
+            self._start()
+        self.queue.put((func, record))
+
+    def join(self):
+        """Block until every queued row has been handed to its sink."""
+        if self._thread is not None:
+            self.queue.join()
+
+    def _start(self):
+        with self._lock:
+            if self._thread is None:
+                thread = threading.Thread(target=self._run, name="pymaap-writer", daemon=True)
+                thread.start()
+                self._thread = thread
+
+    def _run(self):
+        q = self.queue
+        dirty_since = None  # When rows were first written after the last sync
+        while True:
+            if dirty_since is None:
+                timeout = None  # Nothing to sync; block while idle
+            else:
+                timeout = max(0.0, _SYNC_INTERVAL - (time.monotonic() - dirty_since))
+            try:
+                batch = [q.get(timeout=timeout)]
+            except queue.Empty:
+                batch = []
+            while batch and len(batch) < _WRITER_BATCH_SIZE:
+                try:
+                    batch.append(q.get_nowait())
+                except queue.Empty:
+                    break
+            # Only consecutive records are grouped, so rows keep their order per file
+            for func, items in itertools.groupby(batch, key=operator.itemgetter(0)):
+                try:
+                    func([record for _, record in items])
+                except Exception:
+                    logger.exception("Failed to write results rows")
+            if batch and dirty_since is None:
+                dirty_since = time.monotonic()
+            if dirty_since is not None and time.monotonic() - dirty_since >= _SYNC_INTERVAL:
+                dirty_since = time.monotonic() if _sync_sinks() else None
+            for _ in batch:
+                q.task_done()
+
+_record_writer = _RecordWriter(_RECORD_QUEUE_SIZE)
+
+def _sync_sinks():
+    """Push buffered rows to the files; runs on the writer thread. True if some are still unpublished."""
+    with _sinks_lock:
+        sinks = list(_sinks.values())
+    pending = False
+    for sink in sinks:
+        try:
+            pending = sink.sync() or pending
+        except Exception:
+            logger.exception("Failed to sync results file %s", sink.path)
+    return pending
+
+def flush_results():
+    """Write any buffered results to disk so the results files can be read back."""
+    _record_writer.join()
+    with _sinks_lock:
+        sinks = list(_sinks.values())
+    for sink in sinks:
+        sink.flush()
+
+atexit.register(flush_results)
+
+def _flush_on_child_exit(_=None):
+    """
+    Flush results when a multiprocessing child exits.
+
+    Children end with os._exit(), which skips atexit, but they run
+    multiprocessing's own finalizers first. Pool.terminate() (also run by
+    leaving a `with Pool(...)` block) ends workers with SIGTERM, which skips
+    those too, so use pool.close(); pool.join() or call flush_results() in the
+    worker when every row must be kept.
+    """
+    multiprocessing.util.Finalize(None, flush_results, exitpriority=10)
+
+# Runs as each child starts, also when this module was imported before the fork
+multiprocessing.util.register_after_fork(_record_writer, _flush_on_child_exit)
+if multiprocessing.parent_process() is not None:
+    _flush_on_child_exit()  # First imported inside the child, e.g. under the spawn start method
+
+def _close_sinks_before_fork():
+    """Close every results file and hold the locks, so a child inherits no buffered rows."""
+    _sinks_lock.acquire()
+    for sink in _sinks.values():
+        sink._lock.acquire()
+        try:
+            sink._close()
+        except Exception:
+            logger.exception("Failed to close results file %s before fork", sink.path)
+
+def _release_sinks_after_fork():
+    for sink in _sinks.values():
+        sink._lock.release()
+    _sinks_lock.release()
+
+def _reset_sinks_in_child():
+    """Give the child fresh locks; each process then opens its own handles."""
+    global _sinks_lock
+    _sinks_lock = threading.Lock()
+    for sink in _sinks.values():
+        sink._lock = threading.Lock()
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(before=_close_sinks_before_fork,
+                        after_in_parent=_release_sinks_after_fork,
+                        after_in_child=_reset_sinks_in_child)
+
+# File extension and sink class for each supported results_format
+_RESULTS_FORMATS = {
+    "csv": ("csv", _CsvSink),
+    "parquet": ("parquet", _ParquetSink),
+    "feather": ("feather", _FeatherSink),
+}
+
+def _results_sink(results_format, log_dir, stem, schema):
+    """Return the results path and shared sink for `results_format`."""
+    try:
+        extension, sink_cls = _RESULTS_FORMATS[results_format]
+    except KeyError:
+        raise ValueError("results_format must be one of 'csv', 'parquet' or 'feather'") from None
+    path = os.path.join(log_dir, f"{stem}.{extension}")
+    return path, _get_sink(path, sink_cls, schema)
+
+_logging_configured = False
+_logging_lock = threading.Lock()
+_log_listener = None  # Thread that owns the rotating file handler
+
+def _ensure_logging_configured(log_file, max_bytes, backup_count, use_multiprocessing):
+    """
+    Install the root JSON file and console handlers once per process.
+
+    Every Timer calls this, but only the first call builds handlers (and opens
+    the log file); later decorators reuse them instead of reconfiguring logging.
+    Both handlers sit behind a single QueueHandler, so formatting, writes and
+    rotation happen on the listener thread and callers only enqueue records.
+    """
+    global _logging_configured, _log_listener
+    if _logging_configured:
+        return
+    with _logging_lock:
+        if _logging_configured:
+            return
+        _logging_configured = True
+
+        root = logging.getLogger()
+        if root.hasHandlers():  # The application configured logging itself
+            return
+
+        root.setLevel(logging.INFO)
+
+        # Set up file logging with rotation
+        rotating_handler = RotatingFileHandler(log_file, maxBytes=max_bytes, backupCount=backup_count)
+        rotating_handler.setFormatter(JSONFormatter())
+
+        # Set up console logging
+        console_handler = logging.StreamHandler()
+        console_handler.setFormatter(logging.Formatter("%(asctime)s - %(levelname)s - %(message)s"))
+
+        if use_multiprocessing:
+            # Use a queue-based logging handler for multiprocessing safety
+            log_queue = multiprocessing.Queue()
+            root.addHandler(QueueHandler(log_queue))
+
+            # Set up a listener in the parent process to write logs safely
+            _log_listener = QueueListener(log_queue, rotating_handler, console_handler, respect_handler_level=True)
+        else:
+            # SimpleQueue.put takes no handler lock, so threads do not serialize on logging
+            log_queue = queue.SimpleQueue()
+            root.addHandler(QueueHandler(log_queue))
+            _log_listener = QueueListener(log_queue, rotating_handler, console_handler, respect_handler_level=True)
+        _log_listener.start()
+
+def _stop_log_listener():
+    """Write out queued log records; runs at exit, before logging shuts down."""
+    flush_results()  # Pending results still log through the listener
+    if _log_listener is not None and _log_listener._thread is not None:
+        _log_listener.stop()
+
+atexit.register(_stop_log_listener)
 
 # --- Decorators ---
 
+_TIMING_MESSAGE = "Function `%s` executed in %.4f sec"
+_TIMING_MESSAGE_RESOURCES = _TIMING_MESSAGE + ", CPU Time: %.4f sec, Memory Change: %.4f MB, Final Memory: %.4f MB"
+_TIMING_MESSAGE_SAMPLED = _TIMING_MESSAGE_RESOURCES + ", Peak Memory: %.4f MB"
+
 class Timer:
     """
     A decorator for timing and profiling function execution.
     
-    By default, results are saved as a CSV file. With results_format="parquet",
-    results are stored in a Parquet file, appending a new row for each call.
+    By default, results are saved to a Snappy-compressed Parquet file, appending
+    a new row for each call. results_format="feather" writes an LZ4-compressed
+    Feather file instead, and results_format="csv" a plain CSV file.
+    Rows are buffered and written in batches; call flush_results() to read
+    them back before the process exits.
+
+    With sampling_mode=True, CPU and memory figures come from a background
+    thread polling every `sample_interval` seconds instead of being measured
+    around each call, which removes the psutil calls from the hot path. The
+    log message then also reports the peak RSS sampled during the call, and
+    calls that end before the next sample leave the resource columns empty.
+    With sample_every=N, resources are only measured on every Nth call; the
+    other rows record the execution time and leave the resource columns empty.
+
+    Arguments are serialized by the background writer, not in the decorated
+    call, so a mutable argument changed right after the call may be recorded
+    in its new state. capture_args=False leaves the Arguments column empty.
+
+    Call IDs are 16-character random hex strings; use_uuid4=True records
+    standard UUID4 strings instead, for IDs that must be globally unique.
     """
     def __init__(self, log_to_console=True, log_to_file=True, backup_count=5,
                  max_bytes=10*1024*1024,track_resources=True, max_arg_length=None, 
-                 sanitize_func=None, results_format="csv", use_multiprocessing=False):
+                 sanitize_func=None, results_format="parquet", use_multiprocessing=False,
+                 sampling_mode=False, sample_interval=0.01, capture_args=True, sample_every=1,
+                 use_uuid4=False):
         self.log_to_console = log_to_console
         self.log_to_file = log_to_file
         self.max_bytes = max_bytes
@@ -63,230 +750,273 @@ class Timer:
         self.sanitize_func = sanitize_func
         self.results_format = results_format.lower()
         self.use_multiprocessing = use_multiprocessing  # flag for multiprocessing
+        self.sampling_mode = sampling_mode
+        self.capture_args = capture_args
+        self.use_uuid4 = use_uuid4
+        if not isinstance(sample_every, int) or sample_every < 1:
+            raise ValueError("sample_every must be a positive integer")
+        self.sample_every = sample_every
+        self._sampler = _get_sampler(sample_interval) if sampling_mode and track_resources else None
 
         self.log_dir = "logs"
         os.makedirs(self.log_dir, exist_ok=True)
         
-        if self.results_format == "csv":
-            self.RESULTS_FILE = os.path.join(self.log_dir, "timing_results.csv")
-        elif self.results_format == "parquet":
-            self.RESULTS_FILE = os.path.join(self.log_dir, "timing_results.parquet")
-        else:
-            raise ValueError("results_format must be either 'csv' or 'parquet'")
+        self._bind_results_file()
 
         self.LOG_FILE = os.path.join(self.log_dir, "timing.log")
 
-        # Only use multiprocessing Lock if multiprocessing is enabled
-        self.file_lock = multiprocessing.Lock() if self.use_multiprocessing else None
-
         self._ensure_files_exist()
         self._setup_logging()
 
+    def _bind_results_file(self):
+        """
+        Point RESULTS_FILE and the sink at this process's results file.
+
+        With use_multiprocessing=True every process writes its own
+        timing_results.<pid>.csv/.feather (Parquet parts are already per
+        process), so no cross-process lock is needed; merge_results() combines them.
+        """
+        stem = "timing_results"
+        if self.use_multiprocessing and self.results_format != "parquet":
+            stem = f"timing_results.{_pid}"
+        self.RESULTS_FILE, self._sink = _results_sink(self.results_format, self.log_dir, stem, _TIMING_SCHEMA)
+        self._sink_pid = _pid
+
+    @classmethod
+    def merge_results(cls, log_dir="logs", results_format="parquet"):
+        """
+        Fold per-process results files into a single timing_results file.
+
+        Appends every timing_results.<pid>.<ext> written with use_multiprocessing=True
+        to timing_results.<ext>, removes the merged parts and returns the
+        merged path. Call it once the worker processes have finished. Parquet
+        results are one dataset directory already and are returned unchanged.
+        """
+        extension, sink_cls = _RESULTS_FORMATS[results_format.lower()]
+        target = os.path.join(log_dir, f"timing_results.{extension}")
+        if sink_cls is _ParquetSink:
+            return target
+        flush_results()
+        parts = sorted(glob.glob(os.path.join(log_dir, f"timing_results.*.{extension}")))
+        parts = [part for part in parts if part.rsplit(".", 2)[-2].isdigit()]
+        sink = _get_sink(target, sink_cls, _TIMING_SCHEMA)
+        with sink._lock:
+            sink._close()  # Append below without racing this process's own handle
+            if sink_cls is _CsvSink:
+                with open(target, "a", newline="") as out:
+                    if out.tell() == 0:
+                        csv.writer(out).writerow(_TIMING_SCHEMA.names)
+                    for part in parts:
+                        with open(part, newline="") as src:
+                            next(src, None)  # Header
+                            shutil.copyfileobj(src, out)
+            else:
+                tables = [_conform_table(feather.read_table(path, memory_map=False), _TIMING_SCHEMA)
+                          for path in [target] + parts if os.path.exists(path)]
+                merged = pa.concat_tables(tables) if tables else _TIMING_SCHEMA.empty_table()
+                feather.write_feather(merged, target, compression=sink_cls.compression)
+        for part in parts:
+            with _sinks_lock:
+                part_sink = _sinks.pop(part, None)
+            if part_sink is not None:
+                part_sink.flush()
+            os.remove(part)
+        return target
+
     def _ensure_files_exist(self):
         """Ensure necessary files exist with proper headers (for CSV mode)."""
-        if self.use_multiprocessing and self.file_lock:
-            with self.file_lock:
-                self._create_files_if_needed()
-        else:
-            self._create_files_if_needed()
+        self._create_files_if_needed()
 
     def _create_files_if_needed(self):
         """Create necessary files safely, avoiding race conditions."""
         
-        # Ensure CSV file exists and has headers
+        # Ensure CSV file exists and has headers; the sink keeps the handle for its writes
         if self.results_format == "csv":
+            if self._sink.open():
+                logger.info(f"Created fresh {self.RESULTS_FILE}")
+
+        # Ensure Parquet/Feather file exists
+        elif not os.path.exists(self.RESULTS_FILE):  # Avoid unnecessary reads
             try:
-                with open(self.RESULTS_FILE, mode="x", newline="") as file:  # 'x' mode prevents overwriting
-                    writer = csv.writer(file)
-                    writer.writerow(["Timestamp", "UUID", "Function Name", "Execution Time (s)", 
-                                    "CPU Time (sec)", "Memory Change (MB)", "Final Memory Usage (MB)", "Arguments", "Log Message"])
-                    logger.info(f"Created fresh {self.RESULTS_FILE}")
+                self._sink.create_empty()
+                logger.info(f"Created fresh {self.RESULTS_FILE}")
             except FileExistsError:
                 pass  # Another process has already created the file
 
-        # Ensure Parquet file exists
-        elif self.results_format == "parquet":
-            if not os.path.exists(self.RESULTS_FILE):  # Avoid unnecessary reads
-                try:
-                    df_empty = pd.DataFrame(columns=["Timestamp", "UUID", "Function Name", "Execution Time (s)", 
-                                                    "CPU Time (sec)", "Memory Change (MB)", "Final Memory Usage (MB)", "Arguments", "Log Message"])
-                    df_empty.to_parquet(self.RESULTS_FILE, index=False)
-                    logger.info(f"Created fresh {self.RESULTS_FILE}")
-                except FileExistsError:
-                    pass  # Another process has already created the file
-
-        # Ensure log file exists
-        try:
-            with open(self.LOG_FILE, mode="x") as file:
+        # Ensure log file exists; O_EXCL means only one process creates it and nobody truncates it
+        if not os.path.exists(self.LOG_FILE):  # One stat() once the file exists; no open() or exception
+            try:
+                os.close(os.open(self.LOG_FILE, os.O_CREAT | os.O_EXCL | os.O_WRONLY, 0o644))
                 logger.info(f"Created fresh {self.LOG_FILE}")
-        except FileExistsError:
-            pass  # Another process has already created the file
+            except FileExistsError:
+                pass  # Another process created it between the check and the open
         
     def _setup_logging(self):
         """Configure logging with JSON formatting and log rotation, ensuring multiprocessing safety."""
-    
-        # Ensure each process configures its own logging independently
-        logger = logging.getLogger()
-        if logger.hasHandlers():  # Prevent duplicate handlers
-            return  
-    
-        logger.setLevel(logging.INFO)
-    
-        # Create a log queue for multiprocessing safety
-        log_queue = multiprocessing.Queue() if self.use_multiprocessing else None
-    
-        # Set up file logging with rotation
-        rotating_handler = RotatingFileHandler(self.LOG_FILE, maxBytes=self.max_bytes, 
-                                               backupCount=self.backup_count)
-        rotating_handler.setFormatter(JSONFormatter())
-    
-        # Set up console logging
-        console_handler = logging.StreamHandler()
-        console_handler.setFormatter(logging.Formatter("%(asctime)s - %(levelname)s - %(message)s"))
-    
-        if self.use_multiprocessing and log_queue:
-            # Use a queue-based logging handler for multiprocessing safety
-            queue_handler = QueueHandler(log_queue)
-            logger.addHandler(queue_handler)
-    
-            # Set up a listener in the parent process to write logs safely
-            listener = QueueListener(log_queue, rotating_handler, console_handler, respect_handler_level=True)
-            listener.start()
+        _ensure_logging_configured(self.LOG_FILE, self.max_bytes, self.backup_count, self.use_multiprocessing)
+
+    def _safe_serialize(self, obj):
+        """Convert args/kwargs to string with optional sanitization and truncation."""
+        t = type(obj)
+        if t is str:
+            s = obj  # Already a string; skip the str() copy
+        elif t in _PRIMITIVE_TYPES:
+            s = str(obj)  # Cannot fail, so no try/except
+        # Checked by name so neither pandas nor geopandas has to be imported here
+        elif t.__name__ in ("DataFrame", "GeoDataFrame") and hasattr(obj, "__len__"):
+            return f"<DataFrame with {len(obj)} rows>"
         else:
-            # Standard single-process logging
-            logger.addHandler(rotating_handler)
-            logger.addHandler(console_handler)
-
-    def _save_results(self, timestamp, call_uuid, function_name, elapsed_time, cpu_time, mem_change, final_mem, args_repr, log_message):
-        """Save timing and resource results to the chosen file format in a multiprocessing-safe manner."""
-        process_id = os.getpid()
-        thread_count = multiprocessing.cpu_count()
-        row = [
-            timestamp, process_id, thread_count, call_uuid, function_name, 
-            elapsed_time, cpu_time, mem_change, final_mem, args_repr, log_message
-        ]
+            try:
+                s = str(obj)
+            except Exception:
+                s = "<unserializable>"
+        if self.sanitize_func:
+            s = self.sanitize_func(s)
+        if self.max_arg_length is not None and len(s) > self.max_arg_length:
+            s = s[:self.max_arg_length] + "..."
+        return s
 
-        if self.results_format == "csv":
-            # Ensure only one process writes at a time if multiprocessing is enabled
-            if self.use_multiprocessing and self.file_lock:
-                with self.file_lock:
-                    self._write_csv(row)
-            else:
-                self._write_csv(row)
+    def _serialize_arguments(self, args, kwargs):
+        """JSON summary of a call's arguments for the Arguments column."""
+        return _json.dumps({
+            "args": [self._safe_serialize(arg) for arg in args],
+            "kwargs": {k: self._safe_serialize(v) for k, v in kwargs.items()}
+        })
 
-        elif self.results_format == "parquet":
-            # Parquet writes are atomic, but we'll still use the lock to prevent race conditions
-            if self.use_multiprocessing and self.file_lock:
-                with self.file_lock:
-                    self._write_parquet(row)
-            else:
-                self._write_parquet(row)
-
-    def _write_csv(self, row):
-        """Write a row to the CSV file safely using pandas for consistent headers."""
-        columns = [
-            "Timestamp", "Process ID", "Thread Count", "UUID", "Function Name",
-            "Execution Time (s)", "CPU Time (sec)", "Memory Change (MB)",
-            "Final Memory Usage (MB)", "Arguments", "Log Message"
-        ]
-        df = pd.DataFrame([row], columns=columns)
-        header = not os.path.exists(self.RESULTS_FILE) or os.path.getsize(self.RESULTS_FILE) == 0
-        df.to_csv(self.RESULTS_FILE, mode="a", header=header, index=False)
-
-    def _write_parquet(self, row):
-        """Write a row to the Parquet file safely."""
-        row_dict = {
-            "Timestamp": row[0],
-            "Process ID": row[1],
-            "Thread Count": row[2],
-            "UUID": row[3],
-            "Function Name": row[4],
-            "Execution Time (s)": row[5],
-            "CPU Time (sec)": row[6],
-            "Memory Change (MB)": row[7],
-            "Final Memory Usage (MB)": row[8],
-            "Arguments": row[9],
-            "Log Message": row[10]
-        }
-
-        # Read existing parquet file if it exists and append new data
-        try:
-            df_existing = pd.read_parquet(self.RESULTS_FILE)
-            df_new = pd.DataFrame([row_dict])
-            df_combined = pd.concat([df_existing, df_new], ignore_index=True)
-        except (FileNotFoundError, ValueError):
-            # File does not exist or is empty, so create a new DataFrame
-            df_combined = pd.DataFrame([row_dict])
+    def _emit_results(self, records):
+        """Log timing results and save them to the chosen file format in a multiprocessing-safe manner.
+
+        Runs on the background writer thread with a batch of queued records, so
+        neither log handlers nor file writes run inside decorated calls.
+        """
+        process_id = _pid
+        thread_count = _cpu_count
+        rows = []
+        for (timestamp, call_uuid, function_name, elapsed_time, cpu_time, mem_change,
+             final_mem, arguments, log_message, log_args) in records:
+            if self.log_to_console:
+                logger.info(log_message, *log_args)
+            # Stamped with the call's own time, not the moment it was drained
+            log_event(logging.INFO, log_message, *log_args, created=timestamp / 1e9,
+                      extra={"function_name": function_name, "uuid": call_uuid})
+            if self.log_to_file:
+                args_repr = self._serialize_arguments(*arguments) if arguments is not None else None
+                rows.append((
+                    timestamp, process_id, thread_count, call_uuid, function_name,
+                    elapsed_time, cpu_time, mem_change, final_mem, args_repr, log_message % log_args
+                ))
+        if not rows:
+            return
 
-        df_combined.to_parquet(self.RESULTS_FILE, index=False)
+        if self._sink_pid != _pid:  # Forked since the decorator was created
+            self._bind_results_file()
+        self._sink.write_rows(rows)
 
     def __call__(self, func):
-        """Wrap the function call with timing and logging."""
+        """Wrap the function call with timing and logging.
+
+        The flags are resolved here, once per decorated function, so each call
+        only runs the code its configuration needs.
+        """
         if func is None:  # For when no function is given
             return lambda f: self.__call__(f)  # Return a decorator function
-        
-        @functools.wraps(func)
-        def wrapper(*args, **kwargs):
-            call_uuid = str(uuid.uuid4())
-            start_time = time.perf_counter()
-            process = psutil.Process(os.getpid())
-            cpu_start = (process.cpu_times().user + process.cpu_times().system) if self.track_resources else None
-            mem_start = (process.memory_info().rss / (1024 ** 2)) if self.track_resources else None
-    
+
+        if not (self.log_to_console or self.log_to_file or self.track_resources):
+            return func  # Nothing would be recorded, so the call pays no overhead at all
+
+        name = func.__name__
+        log_to_console = self.log_to_console
+        capture_args = self.log_to_file and self.capture_args
+        emit_results = self._emit_results
+        # Module globals and attribute lookups bound once, read as closure cells per call
+        perf_counter_ns = time.perf_counter_ns
+        time_ns = time.time_ns
+        new_call_id = _new_uuid4 if self.use_uuid4 else _new_call_id
+        put_record = _record_writer.put  # The writer object survives fork; reset() only clears it
+
+        def finish(args, kwargs, call_uuid, message, log_args, cpu_time, mem_change, final_mem):
+            # The raw timestamp is formatted (or not, for Arrow) by the sink
+            timestamp = time_ns()
+            # Only references are queued; the writer thread serializes them
+            arguments = (args, kwargs) if capture_args else None
+            # The writer thread logs the message, takes the file lock and does the I/O
+            put_record(emit_results, (timestamp, call_uuid, name, log_args[1], cpu_time,
+                                              mem_change, final_mem, arguments, message, log_args))
+
+        def log_error(call_uuid):
+            log_event(logging.ERROR, "Function `%s` raised an exception", name,
+                      extra={"function_name": name, "uuid": call_uuid})
+
+        def timed_call(*args, **kwargs):
+            call_uuid = new_call_id()
+            start_ns = perf_counter_ns()
             try:
                 result = func(*args, **kwargs)
-            except Exception as e:
-                log_event(logging.ERROR, f"Function `{func.__name__}` raised an exception", 
-                          extra={"function_name": func.__name__, "uuid": call_uuid})
+            except Exception:
+                log_error(call_uuid)
                 raise
-    
-            elapsed_time = time.perf_counter() - start_time
-            cpu_end = (process.cpu_times().user + process.cpu_times().system) if self.track_resources else None
-            mem_end = (process.memory_info().rss / (1024 ** 2)) if self.track_resources else None
-    
-            cpu_time = cpu_end - cpu_start if cpu_start is not None else None
-            mem_change = mem_end - mem_start if mem_start is not None else None
-            final_mem = mem_end if mem_end is not None else None
-    
-            timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    
-            def safe_serialize(obj):
-                """Convert args/kwargs to string with optional sanitization and truncation."""
-                if isinstance(obj, (pd.DataFrame, gpd.GeoDataFrame)):
-                    return f"<DataFrame with {len(obj)} rows>"
+            elapsed_time = (perf_counter_ns() - start_ns) / 1e9  # integer subtraction, one division
+            finish(args, kwargs, call_uuid, _TIMING_MESSAGE, (name, elapsed_time), None, None, None)
+            return result
+
+        if not self.track_resources:
+            return functools.wraps(func)(timed_call)
+
+        def tracked_call(*args, **kwargs):
+            call_uuid = new_call_id()
+            start_ns = perf_counter_ns()
+            cpu_start, mem_start = _read_resources()
+            try:
+                result = func(*args, **kwargs)
+            except Exception:
+                log_error(call_uuid)
+                raise
+            elapsed_time = (perf_counter_ns() - start_ns) / 1e9
+            cpu_end, mem_end = _read_resources()
+            cpu_time = cpu_end - cpu_start
+            mem_change = mem_end - mem_start
+            finish(args, kwargs, call_uuid, _TIMING_MESSAGE_RESOURCES,
+                   (name, elapsed_time, cpu_time, mem_change, mem_end), cpu_time, mem_change, mem_end)
+            return result
+
+        if self._sampler is not None:
+            read_sample = self._sampler.read
+            read_since = self._sampler.read_since
+
+            def tracked_call(*args, **kwargs):  # Background samples instead of psutil calls
+                call_uuid = new_call_id()
+                start_ns = perf_counter_ns()
+                generation, cpu_start, mem_start = read_sample()
                 try:
-                    s = str(obj)
+                    result = func(*args, **kwargs)
                 except Exception:
-                    s = "<unserializable>"
-                if self.sanitize_func:
-                    s = self.sanitize_func(s)
-                if self.max_arg_length is not None and len(s) > self.max_arg_length:
-                    s = s[:self.max_arg_length] + "..."
-                return s
-    
-            args_repr = json.dumps({
-                "args": [safe_serialize(arg) for arg in args],
-                "kwargs": {k: safe_serialize(v) for k, v in kwargs.items()}
-            })
-    
-            log_message = f"Function `{func.__name__}` executed in {elapsed_time:.4f} sec"
-            if self.track_resources:
-                log_message += f", CPU Time: {cpu_time:.4f} sec, Memory Change: {mem_change:.4f} MB, Final Memory: {final_mem:.4f} MB"
-            if self.log_to_console:
-                logger.info(log_message)
-            log_event(logging.INFO, log_message, extra={"function_name": func.__name__,
-                                                         "uuid": call_uuid})
-    
-            # Ensure only one process writes to the file at a time
-            if self.log_to_file:
-                if self.use_multiprocessing and self.file_lock:
-                    with self.file_lock:
-                        self._save_results(timestamp, call_uuid, func.__name__, elapsed_time, cpu_time, mem_change, final_mem, args_repr, log_message)
-                else:
-                    self._save_results(timestamp, call_uuid, func.__name__, elapsed_time, cpu_time, mem_change, final_mem, args_repr, log_message)
-    
-            return result
-    
+                    log_error(call_uuid)
+                    raise
+                elapsed_time = (perf_counter_ns() - start_ns) / 1e9
+                sample = read_since(generation)
+                if sample is None:  # No sample landed inside the call; record no figures rather than 0
+                    finish(args, kwargs, call_uuid, _TIMING_MESSAGE, (name, elapsed_time), None, None, None)
+                    return result
+                cpu_end, mem_end, mem_peak = sample
+                cpu_time = cpu_end - cpu_start
+                mem_change = mem_end - mem_start
+                mem_peak = max(mem_peak, mem_start)
+                finish(args, kwargs, call_uuid, _TIMING_MESSAGE_SAMPLED,
+                       (name, elapsed_time, cpu_time, mem_change, mem_end, mem_peak), cpu_time, mem_change, mem_end)
+                return result
+
+        sample_every = self.sample_every
+        if sample_every == 1:
+            return functools.wraps(func)(tracked_call)
+
+        counter = itertools.count()  # next() is atomic, so threads share it safely
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if next(counter) % sample_every:
+                return timed_call(*args, **kwargs)
+            return tracked_call(*args, **kwargs)
+
         return wrapper
 
 class ErrorCatcher:
@@ -295,12 +1025,13 @@ class ErrorCatcher:
     
     Logs error details with a unique UUID and function name to a dedicated error log file
     (using log rotation, default: 10 MB max size, 5 backups). Optionally sanitizes the exception
-    message and saves error details to a results file in CSV or Parquet format.
+    message and saves error details to a results file in Parquet (default), Feather or CSV format. Like Timer,
+    results are buffered until flush_results() or interpreter exit.
     """
     
     def __init__(self, log_to_console=True, log_to_file=True,
                  error_log_file=None, max_bytes=10*1024*1024, backup_count=5,
-                 sanitize_func=None, results_format="csv", max_arg_length=None):
+                 sanitize_func=None, results_format="parquet", max_arg_length=None, use_uuid4=False):
         self.log_to_console = log_to_console
         self.log_to_file = log_to_file
         self.max_bytes = max_bytes
@@ -308,13 +1039,9 @@ class ErrorCatcher:
         self.sanitize_func = sanitize_func
         self.max_arg_length = max_arg_length
         self.results_format = results_format.lower()
+        self.use_uuid4 = use_uuid4
 
-        if self.results_format == "csv":
-            self.RESULTS_FILE = os.path.join("logs", "error_results.csv")
-        elif self.results_format == "parquet":
-            self.RESULTS_FILE = os.path.join("logs", "error_results.parquet")
-        else:
-            raise ValueError("results_format must be either 'csv' or 'parquet'")
+        self.RESULTS_FILE, self._sink = _results_sink(self.results_format, "logs", "error_results", _ERROR_SCHEMA)
             
         if error_log_file is None:
             self.error_log_file = os.path.join("logs", "error.log")
@@ -328,10 +1055,7 @@ class ErrorCatcher:
     def _ensure_error_file(self):
         """Ensure the error results file exists (for CSV mode)."""
         if self.results_format == "csv":
-            if not os.path.exists(self.RESULTS_FILE):
-                with open(self.RESULTS_FILE, mode="w", newline="") as file:
-                    writer = csv.writer(file)
-                    writer.writerow(["Timestamp", "UUID", "Function Name", "Error Message", "Arguments"])
+            if self._sink.open():
                 logger.info(f"Created fresh {self.RESULTS_FILE}")
     
     def _setup_error_logging(self):
@@ -350,40 +1074,25 @@ class ErrorCatcher:
     
     def _safe_serialize(self, obj):
         """Serialize an object to string with optional sanitization and truncation."""
-        try:
+        t = type(obj)
+        if t is str:
+            s = obj
+        elif t in _PRIMITIVE_TYPES:
             s = str(obj)
-        except Exception:
-            s = "<unserializable>"
+        else:
+            try:
+                s = str(obj)
+            except Exception:
+                s = "<unserializable>"
         if self.sanitize_func:
             s = self.sanitize_func(s)
         if self.max_arg_length is not None and len(s) > self.max_arg_length:
             s = s[:self.max_arg_length] + "..."
         return s
     
-    def _save_error(self, timestamp, call_uuid, function_name, error_msg, args_repr):
-        """Save error details to the chosen results file format."""
-        if self.results_format == "csv":
-            columns = ["Timestamp", "UUID", "Function Name", "Error Message", "Arguments"]
-            row = [timestamp, call_uuid, function_name, error_msg, args_repr]
-            df = pd.DataFrame([row], columns=columns)
-            header = not os.path.exists(self.RESULTS_FILE) or os.path.getsize(self.RESULTS_FILE) == 0
-            df.to_csv(self.RESULTS_FILE, mode="a", header=header, index=False)
-        elif self.results_format == "parquet":
-            row = {
-                "Timestamp": timestamp,
-                "UUID": call_uuid,
-                "Function Name": function_name,
-                "Error Message": error_msg,
-                "Arguments": args_repr
-            }
-            # Append the new row to existing data (if any)
-            try:
-                df_existing = pd.read_parquet(self.RESULTS_FILE)
-                df_new = pd.DataFrame([row])
-                df_combined = pd.concat([df_existing, df_new], ignore_index=True)
-            except (FileNotFoundError, ValueError):
-                df_combined = pd.DataFrame([row])
-            df_combined.to_parquet(self.RESULTS_FILE, index=False)
+    def _save_errors(self, records):
+        """Save a batch of (timestamp, uuid, function, error, arguments) records; runs on the writer thread."""
+        self._sink.write_rows(records)
     
     def __call__(self, func=None):
         """Wrap the function call to catch exceptions, log them, and save error details."""
@@ -391,52 +1100,79 @@ class ErrorCatcher:
             # Returning a wrapper function so that @ErrorCatcher() works
             return lambda f: self.__call__(f)
         
+        name = func.__name__
+        sanitize_func = self.sanitize_func
+        safe_serialize = self._safe_serialize
+        save_errors = self._save_errors
+        new_call_id = _new_uuid4 if self.use_uuid4 else _new_call_id
+
+        if not (self.log_to_console or self.log_to_file):
+            @functools.wraps(func)
+            def thin_wrapper(*args, **kwargs):
+                try:
+                    return func(*args, **kwargs)
+                except Exception as e:
+                    # Only the event log line; arguments are not serialized or saved
+                    error_msg = str(e)
+                    if sanitize_func:
+                        error_msg = sanitize_func(error_msg)
+                    log_event(logging.ERROR, "Function `%s` raised an exception: %s", name, error_msg,
+                              extra={"function_name": name, "uuid": new_call_id()})
+                    raise
+            return thin_wrapper
+
         @functools.wraps(func)
         def wrapper(*args, **kwargs):
-            call_uuid = str(uuid.uuid4())
             try:
                 return func(*args, **kwargs)
             except Exception as e:
-                timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+                # The ID is only needed once something failed, so successful calls skip it
+                call_uuid = new_call_id()
+                timestamp = time.time_ns()
                 error_msg = str(e)
-                if self.sanitize_func:
-                    error_msg = self.sanitize_func(error_msg)
-                args_repr = json.dumps({
-                    "args": [self._safe_serialize(arg) for arg in args],
-                    "kwargs": {k: self._safe_serialize(v) for k, v in kwargs.items()}
+                if sanitize_func:
+                    error_msg = sanitize_func(error_msg)
+                args_repr = _json.dumps({
+                    "args": [safe_serialize(arg) for arg in args],
+                    "kwargs": {k: safe_serialize(v) for k, v in kwargs.items()}
                 })
                 log_event(
                     logging.ERROR,
-                    f"Function `{func.__name__}` raised an exception: {error_msg}",
-                    extra={"function_name": func.__name__, "uuid": call_uuid}
+                    "Function `%s` raised an exception: %s", name, error_msg,
+                    extra={"function_name": name, "uuid": call_uuid}
                 )
-                self._save_error(timestamp, call_uuid, func.__name__, error_msg, args_repr)
+                _record_writer.put(save_errors, (timestamp, call_uuid, name, error_msg, args_repr))
                 raise
         return wrapper
 
 # --- Manual benchmarking tools ---
 
-process = psutil.Process()
 def get_caller_name():
     """Gets name of function that the get_metrics_* is in."""
-    frame = inspect.currentframe()
-    outer = inspect.getouterframes(frame)[2]  # skip self and calling helper
-    return outer.function
+    return sys._getframe(2).f_code.co_name  # skip self and calling helper
+
+_total_memory = psutil.virtual_memory().total  # for memory_percent without re-reading /proc/meminfo
+
+def _process_snapshot():
+    """Read all get_metrics_* figures inside one psutil oneshot() block."""
+    with process.oneshot():  # cpu, memory and thread figures share cached /proc reads
+        cpu_percent = process.cpu_percent(interval=None)
+        mem_info = process.memory_info()
+        cpu_times = process.cpu_times()
+        num_threads = process.num_threads()
+        num_fds = process.num_fds()
+    mem_percent = 100.0 * mem_info.rss / _total_memory  # as process.memory_percent() computes it
+    return cpu_percent, mem_info, mem_percent, cpu_times, num_threads, num_fds
 
 def get_metrics_start(func_name: str = None):
     """Tracks initial performance metrics and adds a line in the log file."""
     if func_name is None:
         func_name = get_caller_name()
 
-    call_id = str(uuid.uuid4())
+    call_id = _new_call_id()
     wall_start = time.time()
     perf_start = time.perf_counter()
-    cpu_percent = process.cpu_percent(interval=None)
-    mem_info = process.memory_info()
-    mem_percent = process.memory_percent()
-    cpu_times = process.cpu_times()
-    num_threads = process.num_threads()
-    num_fds = process.num_fds()
+    cpu_percent, mem_info, mem_percent, cpu_times, num_threads, num_fds = _process_snapshot()
 
     metrics = {
         "func": func_name,
@@ -453,8 +1189,7 @@ def get_metrics_start(func_name: str = None):
     }
 
     logging.info(
-        "%s: start: wall=%.4f perf=%.4f id=%s cpu=%.2f%% rss=%d vms=%d mem%%=%.2f threads=%d fds=%d",
-        func_name, wall_start, perf_start, call_id, cpu_percent,
+        START_FORMAT, func_name, wall_start, perf_start, call_id, cpu_percent,
         mem_info.rss, mem_info.vms, mem_percent, num_threads, num_fds
     )
 
@@ -469,16 +1204,10 @@ def get_metrics_end(metrics_start: dict, func_name: str = None):
     wall_end = time.time()
     perf_end = time.perf_counter()
     duration = perf_end - metrics_start["perf_start"]
-    cpu_percent = process.cpu_percent(interval=None)
-    mem_info = process.memory_info()
-    mem_percent = process.memory_percent()
-    cpu_times = process.cpu_times()
-    num_threads = process.num_threads()
-    num_fds = process.num_fds()
+    cpu_percent, mem_info, mem_percent, cpu_times, num_threads, num_fds = _process_snapshot()
 
     logging.info(
-        "%s: end: wall=%.4f perf=%.4f id=%s duration=%.4fsec cpu=%.2f%% rss=%d vms=%d mem%%=%.2f threads=%d fds=%d",
-        func_name, wall_end, perf_end, call_id, duration, cpu_percent,
+        END_FORMAT, func_name, wall_end, perf_end, call_id, duration, cpu_percent,
         mem_info.rss, mem_info.vms, mem_percent, num_threads, num_fds
     )
 
@@ -1,6 +1,6 @@
 import time
 import pandas as pd
-from pymaap.monitoring import Timer
+from pymaap.monitoring import Timer, flush_results
 
 # --- Define test functions ---
 
@@ -16,6 +16,7 @@ slow_csv()
 
 print("Running Parquet test function...")
 slow_parquet()
+flush_results()
 
 # --- Try reading the output files ---
 print("\nReading logs/timing_results.csv:")
@@ -0,0 +1,27 @@
+# tests/conftest.py
+
+import os
+import shutil
+import sys
+import tempfile
+
+import pytest
+
+_original_cwd = None
+_run_dir = None
+
+@pytest.hookimpl(trylast=True)  # After plugins such as pytest-html have resolved their output paths
+def pytest_configure(config):
+    # Timer and ErrorCatcher write to ./logs as soon as the test modules define
+    # their decorated functions, so move into a scratch directory before collection
+    global _original_cwd, _run_dir
+    _original_cwd = os.getcwd()
+    _run_dir = tempfile.mkdtemp(prefix="pymaap-tests-")
+    os.chdir(_run_dir)
+
+def pytest_unconfigure(config):
+    monitoring = sys.modules.get("pymaap.monitoring")
+    if monitoring is not None:
+        monitoring.flush_results()  # Nothing is left to write once the directory is gone
+    os.chdir(_original_cwd)
+    shutil.rmtree(_run_dir, ignore_errors=True)
@@ -5,7 +5,7 @@ from pathlib import Path
 from unittest import mock
 import pytest
 from datetime import datetime, timedelta
-from pymaap.analysis import detect_recent_dense_block, parse_log_lines, generate_plots
+from pymaap.analysis import find_log_files, load_all_log_lines, detect_recent_dense_block, parse_log_lines, parse_timestamps, generate_plots
 
 # Helper to generate fake log lines
 def fake_log(ts, message):
@@ -26,12 +26,44 @@ def dense_cluster_logs():
     ]
     return logs
 
+def test_load_all_log_lines_skips_invalid_lines(tmp_path):
+    (tmp_path / "timing.log").write_text(
+        '{"timestamp": "2025-01-01 00:00:00,000", "message": "ok \u00e9"}\n'
+        "not json\n"
+        '{"level": "INFO"}\n',
+        encoding="utf-8"
+    )
+    lines = load_all_log_lines(tmp_path)
+    assert lines == [{"timestamp": "2025-01-01 00:00:00,000", "message": "ok \u00e9"}]
+
+def test_load_all_log_lines_reads_last_line_without_newline(tmp_path):
+    (tmp_path / "timing.log").write_bytes(b'\n{"timestamp": "t", "message": "a"}\n\n{"timestamp": "t", "message": "b"}')
+    assert [r["message"] for r in load_all_log_lines(tmp_path)] == ["a", "b"]
+
+def test_find_log_files_lists_rotated_logs(tmp_path):
+    for name in ("timing.log", "timing.log.2", "timing.log.1", "error.log"):
+        (tmp_path / name).write_text("")
+    (tmp_path / "timing.log.d").mkdir()
+    assert [p.name for p in find_log_files(tmp_path)] == ["timing.log", "timing.log.1", "timing.log.2"]
+    assert find_log_files(tmp_path / "missing") == []
+
+def test_load_all_log_lines_keeps_file_order(tmp_path):
+    for name, msg in (("timing.log", "newest"), ("timing.log.1", "older"), ("timing.log.2", "oldest")):
+        (tmp_path / name).write_text('{"timestamp": "t", "message": "%s"}\n' % msg)
+    (tmp_path / "timing.log.3").write_text("")  # Empty files cannot be memory-mapped
+    assert [r["message"] for r in load_all_log_lines(tmp_path)] == ["newest", "older", "oldest"]
+
 def test_detect_recent_dense_block_detects_cluster(dense_cluster_logs):
     start, end = detect_recent_dense_block(dense_cluster_logs)
     assert isinstance(start, datetime)
     assert isinstance(end, datetime)
     assert (end - start).total_seconds() > 25
 
+def test_detect_recent_dense_block_ignores_line_order(dense_cluster_logs):
+    in_order = sorted(dense_cluster_logs, key=lambda line: line["timestamp"])
+    assert detect_recent_dense_block(in_order) == detect_recent_dense_block(dense_cluster_logs)
+    assert detect_recent_dense_block(in_order[::-1]) == detect_recent_dense_block(dense_cluster_logs)
+
 def test_parse_log_lines_creates_dataframe(dense_cluster_logs):
     now = datetime.now()
     df, _ = parse_log_lines(dense_cluster_logs, now, now + timedelta(seconds=60))
@@ -40,6 +72,40 @@ def test_parse_log_lines_creates_dataframe(dense_cluster_logs):
     assert "Perf Duration (s)" in df.columns
     assert df.iloc[0]["Function"] == "func"
 
+def test_precomputed_timestamps_give_same_results(dense_cluster_logs):
+    timestamps = parse_timestamps(dense_cluster_logs)
+    window = detect_recent_dense_block(dense_cluster_logs)
+    assert detect_recent_dense_block(dense_cluster_logs, timestamps=timestamps) == window
+    df, _ = parse_log_lines(dense_cluster_logs, *window)
+    shared, _ = parse_log_lines(dense_cluster_logs, *window, timestamps=timestamps)
+    pd.testing.assert_frame_equal(df, shared)
+
+def test_parse_log_lines_pairs_starts_with_ends():
+    now = datetime.now()
+    logs = [
+        fake_log(now, "f: start: wall=1.0 perf=1.0 id=a cpu=1.0% rss=1 vms=1 mem%=1.0 threads=1 fds=1"),
+        fake_log(now, "f: start: wall=1.0 perf=5.0 id=b cpu=1.0% rss=1 vms=1 mem%=1.0 threads=1 fds=1"),
+        fake_log(now, "f: end: wall=3.0 perf=8.0 id=b duration=2.0sec cpu=1.0% rss=1 vms=1 mem%=1.0 threads=1 fds=1"),
+        fake_log(now, "f: end: wall=3.0 perf=3.0 id=c duration=2.0sec cpu=1.0% rss=1 vms=1 mem%=1.0 threads=1 fds=1"),
+        fake_log(now, "Starting data load"),
+    ]
+    df, _ = parse_log_lines(logs, now, now)
+    assert df["Call ID"].tolist() == ["b"]  # Unmatched starts and ends are dropped
+    assert df["Perf Duration (s)"].tolist() == [3.0]
+
+def test_log_pattern_parses_metrics_formats():
+    from pymaap._log_re import END_FORMAT, PATTERN, START_FORMAT
+    start = PATTERN.match(START_FORMAT % ("f", 1.5, 2.5, "0a1b", 3.0, 10, 20, 4.5, 2, 7))
+    end = PATTERN.match(END_FORMAT % ("f", 2.5, 3.5, "0a1b", 1.0, 3.0, 10, 20, 4.5, 2, 7))
+    assert start["type"] == "start" and start["duration"] is None and start["fds"] == "7"
+    assert end["type"] == "end" and end["duration"] == "1.0000" and end["id"] == "0a1b"
+
+def test_parse_log_lines_empty_window(dense_cluster_logs):
+    past = datetime.now() - timedelta(days=1)
+    df, filtered = parse_log_lines(dense_cluster_logs, past, past + timedelta(seconds=60))
+    assert df.empty and filtered == []
+    assert "Perf Duration (s)" in df.columns
+
 @pytest.fixture
 def sample_df():
     return pd.DataFrame({
@@ -62,7 +128,7 @@ def sample_df():
         "End FDs": [10] * 5
     })
 
-@mock.patch("matplotlib.pyplot.savefig")
+@mock.patch("matplotlib.figure.Figure.savefig")  # plt.savefig and fig.savefig both end up here
 def test_generate_plots_saves_figures(mock_savefig, sample_df, tmp_path):
     generate_plots(sample_df, tmp_path, subtitle="Unit Test Subtitle")
     assert mock_savefig.call_count >= 5  # boxplot, scatter, bars, etc.
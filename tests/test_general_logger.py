@@ -2,6 +2,7 @@
 
 import os
 import json
+import mmap
 import re
 import logging
 import pytest
@@ -18,6 +19,14 @@ def tmp_logs(tmp_path, monkeypatch):
             f.unlink()
     return log_dir
 
+def last_line(path):
+    # Scan back from the end of a memory map instead of reading the whole file
+    with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        end = len(mm)
+        while end and mm[end - 1] in b"\r\n":
+            end -= 1
+        return mm[mm.rfind(b"\n", 0, end) + 1:end].decode()
+
 def test_log_files_created(tmp_logs):
     # Initialize and verify directory + files exist
     pymaap.init_general_logger(log_dir=str(tmp_logs))
@@ -34,7 +43,7 @@ def test_text_log_and_console_output(tmp_logs, capsys):
     captured = capsys.readouterr()
     assert "Hello, world" in captured.out
     # Read text log
-    text = (tmp_logs / "general.log").read_text().strip().splitlines()[-1]
+    text = last_line(tmp_logs / "general.log")
     # Check pattern: timestamp, level, uuid, [name.func], message
     pattern = (
         r"^\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2},\d{3} "
@@ -80,4 +89,95 @@ def test_reinit_no_duplicate_handlers(tmp_logs, capsys):
     handler_types = {type(h) for h in logger.handlers}
     from logging.handlers import RotatingFileHandler
     from logging import StreamHandler
-    assert handler_types == {RotatingFileHandler, StreamHandler}
\ No newline at end of file
+    assert handler_types == {RotatingFileHandler, StreamHandler}
+
+
+def test_json_timestamp_has_milliseconds(tmp_logs):
+    logger = pymaap.init_general_logger(log_dir=str(tmp_logs))
+    logger.info("first")
+    logger.info("second")
+    lines = (tmp_logs / "general.json.log").read_text().strip().splitlines()
+    for line in lines[-2:]:
+        assert re.fullmatch(r"\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2}\.\d{3}", json.loads(line)["timestamp"])
+
+def test_record_uuids_are_valid_uuid4(tmp_logs):
+    import uuid
+    logger = pymaap.init_general_logger(log_dir=str(tmp_logs))
+    for i in range(5):
+        logger.info(f"uuid {i}")
+    lines = (tmp_logs / "general.json.log").read_text().strip().splitlines()
+    ids = [json.loads(line)["uuid"] for line in lines[-5:]]
+    assert len(set(ids)) == 5
+    assert all(uuid.UUID(i).version == 4 and str(uuid.UUID(i)) == i for i in ids)
+
+def test_text_and_json_logs_share_record_uuid(tmp_logs):
+    logger = pymaap.init_general_logger(log_dir=str(tmp_logs))
+    logger.info("correlate me")
+    text = last_line(tmp_logs / "general.log")
+    entry = json.loads(last_line(tmp_logs / "general.json.log"))
+    assert text.split()[3] == entry["uuid"]
+
+def test_rotated_files_stay_under_max_bytes(tmp_logs):
+    logger = pymaap.init_general_logger(log_dir=str(tmp_logs), max_bytes=300, backup_count=2)
+    for i in range(50):
+        logger.info(f"msg {i}")
+    sizes = {p.name: p.stat().st_size for p in tmp_logs.iterdir()}
+    assert {"general.log", "general.log.1.log", "general.log.2.log"} <= set(sizes)
+    assert all(0 < size < 300 for size in sizes.values())
+    assert last_line(tmp_logs / "general.log").endswith("msg 49")
+
+def test_rotation_counts_encoded_bytes(tmp_logs):
+    logger = pymaap.init_general_logger(log_dir=str(tmp_logs), max_bytes=500, backup_count=2)
+    for i in range(20):
+        logger.info("é" * 100 + f" {i}")  # Two lines fit in 500 characters, not in 500 bytes
+    assert all(p.stat().st_size <= 500 for p in tmp_logs.iterdir())
+
+def test_emit_after_close_reopens_the_file(tmp_logs):
+    logger = pymaap.init_general_logger(log_dir=str(tmp_logs))
+    logger.handlers[0].close()
+    logger.info("after close")
+    assert last_line(tmp_logs / "general.log").endswith("after close")
+
+def test_rotation_sees_writes_from_other_processes(tmp_logs, monkeypatch):
+    from pymaap import logging_setup
+    monkeypatch.setattr(logging_setup, "_SIZE_REFRESH_RECORDS", 0)  # Re-read the size on every record
+    logger = pymaap.init_general_logger(log_dir=str(tmp_logs), max_bytes=300, backup_count=2)
+    logger.info("first")
+    with open(tmp_logs / "general.log", "a") as f:
+        f.write("x" * 250 + "\n")  # Appended behind the handler's back
+    logger.info("second")
+    assert (tmp_logs / "general.log.1.log").exists()
+    assert last_line(tmp_logs / "general.log").endswith("second")
+
+@pytest.mark.skipif(not hasattr(os, "fork"), reason="needs os.fork")
+def test_forked_child_rereads_log_size(tmp_logs):
+    logger = pymaap.init_general_logger(log_dir=str(tmp_logs))
+    handler = logger.handlers[0]
+    logger.info("before fork")
+    go_read, go_write = os.pipe()
+    result_read, result_write = os.pipe()
+    pid = os.fork()
+    if pid == 0:
+        os.read(go_read, 1)  # Wait until the parent has written
+        logger.info("from child")
+        os.write(result_write, b"1" if handler._size == os.path.getsize(handler.baseFilename) else b"0")
+        os._exit(0)
+    logger.info("from parent")
+    os.write(go_write, b"1")
+    os.waitpid(pid, 0)
+    assert os.read(result_read, 1) == b"1"
+
+@pytest.mark.skipif(not hasattr(os, "fork"), reason="needs os.fork")
+def test_forked_child_does_not_reuse_pooled_uuids(tmp_logs):
+    from pymaap import logging_setup
+    logger = pymaap.init_general_logger(log_dir=str(tmp_logs))
+    logger.info("fill the pool")
+    pooled = set(logging_setup._uuid_pool)
+    read_fd, write_fd = os.pipe()
+    pid = os.fork()
+    if pid == 0:
+        os.write(write_fd, str(len(logging_setup._uuid_pool)).encode())
+        os._exit(0)
+    os.close(write_fd)
+    os.waitpid(pid, 0)
+    assert pooled and os.read(read_fd, 16) == b"0"
@@ -1,12 +1,16 @@
 # tests/test_monitoring.py
 
+import json
+import logging
 import time
 import multiprocessing
 import os
+import shutil
 import pandas as pd
 import pytest
 
-from pymaap.monitoring import Timer, ErrorCatcher, get_metrics_start, get_metrics_end
+from pymaap import monitoring
+from pymaap.monitoring import Timer, ErrorCatcher, flush_results, sanitizer, get_metrics_start, get_metrics_end
 from pymaap.analysis import analysis
 from pymaap.logging_backend import init_multiprocessing_logging, shutdown_multiprocessing_logging
 
@@ -22,9 +26,13 @@ def init_logging():
 @pytest.fixture(scope="session", autouse=True)
 def clear_logs():
     os.makedirs("logs", exist_ok=True)
-    for f in ["timing_results.csv", "timing_results.parquet", "error_results.csv"]:
+    flush_results()  # Release results files opened by earlier imports
+    for f in ["timing_results.csv", "timing_results.parquet", "timing_results.feather",
+              "error_results.csv", "error_results.parquet"]:
         path = os.path.join("logs", f)
-        if os.path.exists(path):
+        if os.path.isdir(path):  # Parquet results are a directory of part files
+            shutil.rmtree(path)
+        elif os.path.exists(path):
             os.remove(path)
     yield  # tests run here
 
@@ -34,15 +42,39 @@ def slow_csv(x): time.sleep(x)
 @Timer(log_to_console=False, log_to_file=True, results_format="parquet", use_multiprocessing=False)
 def slow_parquet(x): time.sleep(x)
 
+@Timer(log_to_console=False, log_to_file=True, results_format="feather", use_multiprocessing=False)
+def slow_feather(x): time.sleep(x)
+
 @Timer(log_to_console=False, log_to_file=True, results_format="csv", use_multiprocessing=True)
 def slow_csv_mp(x): time.sleep(x)
 
 @Timer(log_to_console=False, log_to_file=True, results_format="parquet", use_multiprocessing=True)
 def slow_parquet_mp(x): time.sleep(x)
 
+@Timer(log_to_console=False, log_to_file=True, results_format="csv")
+def count_rows(df): return len(df)
+
+@Timer(log_to_console=False, log_to_file=True, results_format="csv", track_resources=False)
+def untracked(x): return x
+
+@Timer(log_to_console=False, log_to_file=True, results_format="csv", capture_args=False)
+def uncaptured(secret): return secret
+
+@Timer(log_to_console=False, log_to_file=True, results_format="csv", sample_every=3)
+def every_third(x): return x
+
+@Timer(log_to_console=False, log_to_file=True, results_format="csv", sampling_mode=True)
+def slow_csv_sampled(x): time.sleep(x)
+
+@Timer(log_to_console=False, log_to_file=True, results_format="csv", sampling_mode=True, sample_interval=3600)
+def rarely_sampled(x): return x
+
 @ErrorCatcher(log_to_console=False, log_to_file=True, results_format="csv")
 def faulty(): return 1 / 0
 
+@ErrorCatcher(log_to_console=False, log_to_file=True, results_format="parquet")
+def faulty_parquet(): return 1 / 0
+
 @ErrorCatcher(log_to_console=False, log_to_file=True, results_format="csv")
 def faulty_mp(x):
     # This will raise ZeroDivisionError when x == 0
@@ -52,61 +84,376 @@ def faulty_mp(x):
 
 def test_csv_single():
     slow_csv(0.5)
+    flush_results()
     df = pd.read_csv("logs/timing_results.csv")
     assert not df.empty
     assert (df["Execution Time (s)"] > 0).all()
     assert "Function Name" in df.columns
     assert df["Function Name"].str.contains("slow_csv").any()
+    assert df["Process ID"].eq(os.getpid()).all()
+    pd.to_datetime(df["Timestamp"], format="%Y-%m-%d %H:%M:%S")  # raises if not formatted
+
+def test_csv_sampling_mode():
+    slow_csv_sampled(0.1)
+    flush_results()
+    df = pd.read_csv("logs/timing_results.csv")
+    row = df[df["Function Name"] == "slow_csv_sampled"].iloc[-1]
+    assert row["Final Memory Usage (MB)"] > 0
+    assert row["CPU Time (sec)"] >= 0
+    assert "Peak Memory" in row["Log Message"]
+
+def test_sampling_mode_without_new_sample_records_no_figures():
+    rarely_sampled(1)  # Starts the sampler, which then sleeps for an hour
+    flush_results()
+    df = pd.read_csv("logs/timing_results.csv")
+    row = df[df["Function Name"] == "rarely_sampled"].iloc[-1]
+    assert pd.isna(row["CPU Time (sec)"]) and pd.isna(row["Memory Change (MB)"])
+
+def test_sampler_reports_peak_since_generation(monkeypatch):
+    samples = iter([(0.0, 100.0), (0.1, 300.0), (0.2, 200.0), (0.3, 150.0), (0.4, 250.0)])
+    monkeypatch.setattr(monitoring, "_read_resources", lambda: next(samples))
+    sampler = monitoring._ResourceSampler(3600)  # Sampled by hand, no thread
+    sampler._sample()
+    generation = sampler.latest[0]
+    assert sampler.read_since(generation) is None
+    for _ in range(3):
+        sampler._sample()
+    assert sampler.read_since(generation) == (0.3, 150.0, 300.0)
+    later = sampler.latest[0] - 1  # After the 300 MB spike
+    sampler._sample()
+    assert sampler.read_since(later) == (0.4, 250.0, 250.0)
 
 def test_parquet_single():
     slow_parquet(0.5)
+    flush_results()
     df = pd.read_parquet("logs/timing_results.parquet")
     assert not df.empty
     assert "Function Name" in df.columns
+    assert pd.api.types.is_datetime64_any_dtype(df["Timestamp"])
     assert df["Execution Time (s)"].max() > 0
 
-@pytest.mark.skip(reason="Multiprocessing currently not supported in Timer")
-def test_csv_multiprocessing():
-    with multiprocessing.Pool(2) as pool:
-        pool.map(slow_csv_mp, [0.5, 0.5])
+def test_parquet_keeps_rows_across_flushes():
+    slow_parquet(0)
+    flush_results()
+    before = len(pd.read_parquet("logs/timing_results.parquet"))
+    slow_parquet(0)
+    slow_parquet(0)
+    flush_results()
+    df = pd.read_parquet("logs/timing_results.parquet")
+    assert len(df) == before + 2
+    assert "Process ID" in df.columns
+
+def test_parquet_migrates_single_file(tmp_path):
+    from pymaap.monitoring import _ParquetSink, _TIMING_SCHEMA
+    path = str(tmp_path / "timing_results.parquet")
+    old = pd.read_parquet("logs/timing_results.parquet").head(1)
+    old.to_parquet(path)  # layout written by earlier versions: one plain file
+    sink = _ParquetSink(path, _TIMING_SCHEMA)
+    sink.write_rows([tuple(old.iloc[0])])
+    sink.flush()
+    assert os.path.isdir(path)
+    assert len(pd.read_parquet(path)) == 2
+
+def test_parquet_batches_are_coalesced_into_row_groups(tmp_path):
+    import pyarrow.parquet as pq
+    from pymaap.monitoring import _ParquetSink, _TIMING_SCHEMA
+    path = str(tmp_path / "timing_results.parquet")
+    row = tuple(pd.read_parquet("logs/timing_results.parquet").iloc[0])
+    sink = _ParquetSink(path, _TIMING_SCHEMA)
+    for _ in range(3):
+        sink.write_rows([row] * 600)  # Each call writes a full batch
+    sink.flush()
+    (part,) = os.listdir(path)
+    assert pq.ParquetFile(os.path.join(path, part)).num_row_groups == 1
+    assert len(pd.read_parquet(path)) == 1800
+
+def test_parquet_unfinished_part_is_not_read(tmp_path):
+    from pymaap.monitoring import _ParquetSink, _TIMING_SCHEMA
+    path = str(tmp_path / "timing_results.parquet")
+    row = tuple(pd.read_parquet("logs/timing_results.parquet").iloc[0])
+    _ParquetSink(path, _TIMING_SCHEMA).create_empty()
+    dead = _ParquetSink(path, _TIMING_SCHEMA)  # Like a process killed before close
+    dead.write_rows([row] * 600)
+    assert len(pd.read_parquet(path)) == 0
+    sink = _ParquetSink(path, _TIMING_SCHEMA)
+    sink.write_rows([row])
+    sink.flush()
+    assert len(pd.read_parquet(path)) == 1
+
+@pytest.fixture
+def new_york_time(monkeypatch):
+    # A zone away from UTC, so local and UTC timestamps cannot agree by accident
+    monkeypatch.setenv("TZ", "America/New_York")
+    monkeypatch.setattr(monitoring, "_timestamp_cache", (None, ""))
+    time.tzset()
+    yield "America/New_York"
+    monkeypatch.undo()
+    time.tzset()
+
+def test_csv_and_parquet_timestamps_agree(tmp_path, new_york_time):
+    row = (time.time_ns(), os.getpid(), 1, "id", "f", 0.1, None, None, None, None, "message")
+    csv_sink = monitoring._CsvSink(str(tmp_path / "timing_results.csv"), monitoring._TIMING_SCHEMA)
+    parquet_sink = monitoring._ParquetSink(str(tmp_path / "timing_results.parquet"), monitoring._TIMING_SCHEMA)
+    for sink in (csv_sink, parquet_sink):
+        sink.write_rows([row])
+        sink.flush()
+    csv_text = pd.read_csv(tmp_path / "timing_results.csv")["Timestamp"].iloc[0]
+    parquet_time = pd.read_parquet(tmp_path / "timing_results.parquet")["Timestamp"].iloc[0]
+    assert parquet_time.tz_convert(new_york_time).strftime("%Y-%m-%d %H:%M:%S") == csv_text
+
+def test_parquet_migration_reads_old_text_timestamps_as_local_time(tmp_path, new_york_time):
+    from pymaap.monitoring import _ParquetSink, _TIMING_SCHEMA
+    path = str(tmp_path / "timing_results.parquet")
+    old = pd.read_parquet("logs/timing_results.parquet").head(1)
+    old["Timestamp"] = "2024-01-15 12:00:00"  # How the first versions stored it, in local time
+    old.to_parquet(path)
+    _ParquetSink(path, _TIMING_SCHEMA).create_empty()
+    migrated = pd.read_parquet(path)["Timestamp"].iloc[0]
+    assert migrated == pd.Timestamp("2024-01-15 17:00:00", tz="UTC")
+
+def test_feather_single():
+    slow_feather(0)
+    flush_results()
+    slow_feather(0)
+    flush_results()
+    df = pd.read_feather("logs/timing_results.feather")
+    assert len(df) == 2
+    assert df["Function Name"].eq("slow_feather").all()
+
+def test_csv_without_resource_tracking():
+    assert untracked(3) == 3
+    flush_results()
+    df = pd.read_csv("logs/timing_results.csv")
+    row = df[df["Function Name"] == "untracked"].iloc[-1]
+    assert row["Execution Time (s)"] >= 0
+    assert pd.isna(row["CPU Time (sec)"])
+    assert "CPU Time" not in row["Log Message"]
+
+def test_rows_from_many_threads_are_all_written():
+    from concurrent.futures import ThreadPoolExecutor
+    flush_results()
+    before = (pd.read_csv("logs/timing_results.csv")["Function Name"] == "untracked").sum()
+    with ThreadPoolExecutor(4) as pool:
+        list(pool.map(untracked, range(1000)))
+    flush_results()
+    df = pd.read_csv("logs/timing_results.csv")
+    assert (df["Function Name"] == "untracked").sum() == before + 1000
+
+def test_csv_rows_are_synced_without_flush(monkeypatch):
+    monkeypatch.setattr(monitoring, "_SYNC_INTERVAL", 0.1)  # The writer reads it on every pass
+    flush_results()
+    before = len(pd.read_csv("logs/timing_results.csv"))
+    untracked(1)
+    time.sleep(0.5)  # Longer than the writer's sync interval
+    assert len(pd.read_csv("logs/timing_results.csv")) == before + 1
+
+def test_parquet_rows_are_published_without_flush(monkeypatch):
+    monkeypatch.setattr(monitoring, "_SYNC_INTERVAL", 0.1)
+    monkeypatch.setattr(monitoring, "_ARROW_PUBLISH_INTERVAL", 0.2)
+    flush_results()
+    before = len(pd.read_parquet("logs/timing_results.parquet"))
+    slow_parquet(0)
+    time.sleep(1)  # Several sync passes; the second one after the publish interval closes the part
+    assert len(pd.read_parquet("logs/timing_results.parquet")) == before + 1
+
+def test_sample_every_measures_resources_on_every_nth_call():
+    for i in range(6):
+        every_third(i)
+    flush_results()
+    df = pd.read_csv("logs/timing_results.csv")
+    rows = df[df["Function Name"] == "every_third"]
+    assert len(rows) == 6
+    assert rows["CPU Time (sec)"].notna().tolist() == [True, False, False] * 2
+
+def test_capture_args_false_skips_arguments():
+    uncaptured("hunter2")
+    flush_results()
+    df = pd.read_csv("logs/timing_results.csv")
+    row = df[df["Function Name"] == "uncaptured"].iloc[-1]
+    assert pd.isna(row["Arguments"])
+
+@pytest.mark.skipif(not hasattr(os, "fork"), reason="requires os.fork")
+def test_fork_does_not_duplicate_buffered_rows():
+    flush_results()
+    before = (pd.read_csv("logs/timing_results.csv")["Function Name"] == "untracked").sum()
+    untracked(1)
+    time.sleep(0.1)  # Let the writer thread buffer the row in the CSV handle
+    pid = os.fork()
+    if pid == 0:
+        untracked(2)
+        flush_results()
+        os._exit(0)
+    os.waitpid(pid, 0)
+    flush_results()
+    df = pd.read_csv("logs/timing_results.csv")
+    assert (df["Function Name"] == "untracked").sum() == before + 2
+
+@pytest.mark.skipif(not hasattr(os, "fork"), reason="requires os.fork")
+def test_multiprocessing_writes_per_process_files():
+    pid = os.fork()
+    if pid == 0:
+        slow_csv_mp(0)
+        flush_results()
+        os._exit(0)
+    os.waitpid(pid, 0)
+    assert os.path.exists(f"logs/timing_results.{pid}.csv")
+    merged = Timer.merge_results(results_format="csv")
+    assert not os.path.exists(f"logs/timing_results.{pid}.csv")
+    df = pd.read_csv(merged)
+    assert df["Process ID"].eq(pid).any()
+    assert not df["Timestamp"].eq("Timestamp").any()  # Part headers are not copied
+
+def test_dataframe_arguments_are_summarized():
+    count_rows(pd.DataFrame({"a": [1, 2, 3]}))
+    flush_results()
     df = pd.read_csv("logs/timing_results.csv")
-    assert len(df) >= 2
+    assert df["Arguments"].str.contains("<DataFrame with 3 rows>").any()
+
+def test_timer_does_not_reconfigure_logging():
+    handlers = list(logging.getLogger().handlers)
+    Timer(log_to_console=False)
+    Timer(log_to_console=False, results_format="csv")
+    assert logging.getLogger().handlers == handlers
+
+def test_json_formatter_keeps_default_timestamp_layout():
+    from pymaap.monitoring import JSONFormatter
+    record = logging.LogRecord("t", logging.INFO, __file__, 0, "value=%s", (1,), None)
+    line = json.loads(JSONFormatter().format(record))
+    assert line["timestamp"] == logging.Formatter().formatTime(record)
+    assert line["message"] == "value=1"
+
+def _run_log_writer(log_file, records):
+    import queue
+    from pymaap.logging_backend import _STOP, _writer_worker
+    log_queue = queue.SimpleQueue()
+    for record in records + [_STOP]:
+        log_queue.put(record)
+    _writer_worker(log_queue, str(log_file))  # Returns once it reaches _STOP
+
+def test_log_writer_survives_a_bad_record(tmp_path):
+    bad = logging.LogRecord("t", logging.INFO, __file__, 0, "%d", ("not a number",), None)
+    good = logging.LogRecord("t", logging.INFO, __file__, 0, "fine", (), None)
+    _run_log_writer(tmp_path / "timing.log", [bad, good])
+    lines = (tmp_path / "timing.log").read_text().splitlines()
+    assert [json.loads(line)["message"] for line in lines] == ["fine"]
+
+def test_log_writer_rotates_on_encoded_bytes(tmp_path):
+    record = logging.LogRecord("t", logging.INFO, __file__, 0, "é" * 1000, (), None)
+    _run_log_writer(tmp_path / "timing.log", [record] * 6000)  # ~6.5 MB of text, ~12.5 MB of UTF-8
+    files = sorted(tmp_path.iterdir())
+    assert len(files) == 2
+    assert all(f.stat().st_size <= 10 * 1024 * 1024 for f in files)
+
+def test_unknown_results_format():
+    with pytest.raises(ValueError):
+        Timer(results_format="xlsx")
+
+def test_csv_multiprocessing():
+    merged = Timer.merge_results(results_format="csv")
+    before = (pd.read_csv(merged)["Function Name"] == "slow_csv_mp").sum()
+    pool = multiprocessing.Pool(2)
+    pool.map(slow_csv_mp, [0] * 6)
+    pool.close()
+    pool.join()  # Workers flush their rows as they exit
+    df = pd.read_csv(Timer.merge_results(results_format="csv"))
+    assert (df["Function Name"] == "slow_csv_mp").sum() == before + 6
 
-@pytest.mark.skip(reason="Multiprocessing currently not supported in Timer")
 def test_parquet_multiprocessing():
-    with multiprocessing.Pool(2) as pool:
-        pool.map(slow_parquet_mp, [0.5, 0.5])
+    flush_results()
+    before = (pd.read_parquet("logs/timing_results.parquet")["Function Name"] == "slow_parquet_mp").sum()
+    pool = multiprocessing.Pool(2)
+    pool.map(slow_parquet_mp, [0] * 6)
+    pool.close()
+    pool.join()
     df = pd.read_parquet("logs/timing_results.parquet")
-    assert len(df) >= 2
+    assert (df["Function Name"] == "slow_parquet_mp").sum() == before + 6
 
-@pytest.mark.skip(reason="Multiprocessing currently not supported in Timer")
 def test_error_multiprocessing():
-    with multiprocessing.Pool(2) as pool:
-        # One succeeds, one raises ZeroDivisionError
-        with pytest.raises(ZeroDivisionError):
-            pool.map(faulty_mp, [1, 0])  # 1 is fine, 0 triggers division by zero
+    with pytest.raises(ZeroDivisionError):
+        faulty_mp(0)  # Creates the results file in this process first
+    flush_results()
+    before = (pd.read_csv("logs/error_results.csv")["Function Name"] == "faulty_mp").sum()
+    pool = multiprocessing.Pool(2)
+    results = [pool.apply_async(faulty_mp, (x,)) for x in [1, 0, 0]]  # 0 triggers division by zero
+    pool.close()
+    pool.join()  # Workers exit on their own this time
+    with pytest.raises(ZeroDivisionError):
+        results[1].get()
 
     df = pd.read_csv("logs/error_results.csv")
-    assert len(df) >= 1
-    assert "Error Message" in df.columns
+    assert (df["Function Name"] == "faulty_mp").sum() == before + 2
     assert df["Error Message"].str.contains("division").any()
 
 def test_error_logging():
     with pytest.raises(ZeroDivisionError):
         faulty()
+    flush_results()
     df = pd.read_csv("logs/error_results.csv")
     assert not df.empty
     assert "Error Message" in df.columns
     assert df["Error Message"].str.contains("division").any()
 
+def test_error_logging_parquet():
+    with pytest.raises(ZeroDivisionError):
+        faulty_parquet()
+    flush_results()
+    df = pd.read_parquet("logs/error_results.parquet")
+    assert df["Function Name"].eq("faulty_parquet").any()
+    assert df["Error Message"].str.contains("division").any()
+
+def test_error_parquet_appends_part_files():
+    for _ in range(2):
+        for _ in range(3):
+            with pytest.raises(ZeroDivisionError):
+                faulty_parquet()
+        flush_results()
+    parts = os.listdir("logs/error_results.parquet")
+    assert len(parts) >= 2  # one part per flush; earlier parts are never rewritten
+    df = pd.read_parquet("logs/error_results.parquet")
+    assert df["Function Name"].eq("faulty_parquet").sum() >= 6
+
 def test_manual_metrics_tracking():
     start = get_metrics_start("manual_test")
     time.sleep(1)
     end = get_metrics_end(start, "manual_test")
     assert end["duration"] >= 1.0
 
+def test_metrics_end_returns_a_new_dict():
+    start = get_metrics_start("pair")
+    end = get_metrics_end(start)
+    assert isinstance(start, dict) and isinstance(end, dict)
+    assert "duration" not in start  # The start record is left as it was
+    assert end["id"] == start["id"] and end["rss_end"] > 0
+    assert end["duration"] == end["perf_end"] - start["perf_start"]
+    json.dumps({**start, **end})  # Plain values, as before
+
+def test_metrics_default_to_caller_name():
+    def instrumented_block():
+        return get_metrics_start()
+    assert instrumented_block()["func"] == "instrumented_block"
+
+def test_timer_with_everything_off_returns_function():
+    def plain(x): return x
+    assert Timer(log_to_console=False, log_to_file=False, track_resources=False)(plain) is plain
+
+def test_use_uuid4_records_standard_uuids():
+    @Timer(log_to_console=False, log_to_file=True, results_format="feather", use_uuid4=True)
+    def uuid_tagged(): return 1
+    uuid_tagged()
+    flush_results()
+    df = pd.read_feather("logs/timing_results.feather")
+    ids = df.loc[df["Function Name"] == "uuid_tagged", "UUID"]
+    assert ids.str.fullmatch(r"[0-9a-f]{8}-[0-9a-f]{4}-4[0-9a-f]{3}-[0-9a-f]{4}-[0-9a-f]{12}").all()
+
+def test_sanitizer_masks_digits():
+    assert sanitizer("card 4111-1111, exp 09/27") == "card ****-****, exp **/**"
+    assert sanitizer("no digits") == "no digits"
+
 def test_log_formatting():
+    flush_results()
     df = pd.read_csv("logs/timing_results.csv")
     assert "UUID" in df.columns
     assert df["UUID"].str.len().gt(10).all()
+    assert df["UUID"].str.fullmatch(r"[0-9a-f]{16}").all()
+    assert df["UUID"].is_unique
     assert df["Function Name"].str.contains("slow_").any()
\ No newline at end of file